@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Memory / recall / latency report for edge ANN index types.
+
+Ground truth comes from an exact ``Flat`` inner-product search. Every index type
+is built once and then queried with each value of its query-time parameter
+(``nprobe`` for IVF, ``efSearch`` for HNSW), reporting serialized index size,
+build time, per-query latency and recall@k against the flat results. With
+``--rerank F``, quantised types (SQ/PQ) get an extra row where the top ``k * F``
+candidates are re-scored with exact float32 vectors, as ``EDGE_RERANK_FACTOR``
+does at query time.
+
+Vectors are read from an existing edge index (``--dataset`` / ``--index``) or
+generated synthetically (``--synthetic N``). Queries are held-out index vectors
+with a little noise added, which mimics a question that paraphrases an edge
+sentence.
+
+Usage:
+    python benchmark/bench_ann_index.py --dataset hotpotQA
+    python benchmark/bench_ann_index.py --synthetic 200000 --dim 256 \\
+        --types HNSW32 "IVF1024,Flat" "IVF1024,PQ32" --json report.json
+    python benchmark/bench_ann_index.py --dataset hotpotQA --types SQfp16 SQ8 PQ64 --rerank 4
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from config import get_config
+from index.ann_index import apply_search_params, build_ann_index, rerank_exact
+from index.edge_embedding import normalize_rows
+
+SWEEPS = {
+    "nprobe": [1, 4, 8, 16, 32, 64, 128],
+    "efSearch": [16, 32, 64, 128, 256],
+}
+
+
+def load_vectors(args) -> np.ndarray:
+    if args.synthetic:
+        rng = np.random.default_rng(0)
+        # Clustered data behaves more like real embeddings than i.i.d. noise
+        centers = rng.standard_normal((max(args.synthetic // 500, 8), args.dim)).astype("float32")
+        assign = rng.integers(0, len(centers), args.synthetic)
+        vecs = centers[assign] + 0.6 * rng.standard_normal((args.synthetic, args.dim)).astype("float32")
+        return normalize_rows(vecs)
+
+    index_path = args.index or str(get_config(args.dataset).get_edge_index_file())
+    index = faiss.read_index(index_path)
+    print(f"📥 {index_path}: {index.ntotal} vectors, dim={index.d}")
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(f[f >= 0]) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def timed_search(index, queries: np.ndarray, k: int, exact: np.ndarray = None, rerank: int = 0):
+    """Search one query at a time, as the retriever does; returns (ids, ms/query)."""
+    out = np.empty((len(queries), k), dtype=np.int64)
+    start = time.perf_counter()
+    for i in range(len(queries)):
+        q = queries[i:i + 1]
+        if rerank:
+            _D, I = index.search(q, min(k * rerank, index.ntotal))
+            _D, I = rerank_exact(q, I, exact, k)
+        else:
+            _D, I = index.search(q, k)
+        out[i] = I[0]
+    return out, (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def index_mb(index) -> float:
+    return len(faiss.serialize_index(index)) / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall vs. latency of edge ANN index types")
+    parser.add_argument("--dataset", help="Dataset whose edge index provides the vectors")
+    parser.add_argument("--index", help="Path to a Flat edge index (overrides --dataset)")
+    parser.add_argument("--synthetic", type=int, help="Use N synthetic vectors instead")
+    parser.add_argument("--dim", type=int, default=256, help="Dimension for --synthetic")
+    parser.add_argument("--types", nargs="+", default=["HNSW32", "IVF256,Flat", "IVF256,PQ32"])
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=50, help="Neighbours per query (TOP_K1)")
+    parser.add_argument("--train-size", type=int, default=get_config().edge_index_train_size)
+    parser.add_argument("--rerank", type=int, default=0, help="Also report exact re-ranking of k*F candidates")
+    parser.add_argument("--json", help="Write the report as JSON to this path")
+    args = parser.parse_args()
+    if not (args.synthetic or args.dataset or args.index):
+        parser.error("one of --dataset, --index or --synthetic is required")
+
+    vecs = load_vectors(args)
+    rng = np.random.default_rng(1)
+    q_rows = rng.choice(len(vecs), size=min(args.queries, len(vecs)), replace=False)
+    queries = normalize_rows(vecs[q_rows] + 0.05 * rng.standard_normal(vecs[q_rows].shape).astype("float32"))
+    k = min(args.k, len(vecs))
+
+    flat = build_ann_index(vecs, "Flat", args.train_size)
+    truth, flat_ms = timed_search(flat, queries, k)
+    report = [{"index_type": "Flat", "param": None, "value": None, "build_s": 0.0,
+               "memory_mb": index_mb(flat), "ms_per_query": flat_ms, "recall": 1.0}]
+
+    for spec in args.types:
+        start = time.perf_counter()
+        index = build_ann_index(vecs, spec, args.train_size)
+        build_s = time.perf_counter() - start
+        mem = index_mb(index)
+        param = "nprobe" if "IVF" in spec else "efSearch" if "HNSW" in spec else None
+        quantized = "SQ" in spec or "PQ" in spec
+        for value in SWEEPS.get(param, [None]):
+            if param:
+                if not apply_search_params(index, {param: value}):
+                    continue
+            for rerank in ([0, args.rerank] if quantized and args.rerank else [0]):
+                found, ms = timed_search(index, queries, k, vecs, rerank)
+                report.append({"index_type": spec + (f" +rerank x{rerank}" if rerank else ""),
+                               "param": param, "value": value, "build_s": build_s, "memory_mb": mem,
+                               "ms_per_query": ms, "recall": recall_at_k(found, truth)})
+
+    print(f"\n{len(vecs)} vectors, {len(queries)} queries, recall@{k} vs. Flat")
+    print(f"{'index_type':<28}{'param':<14}{'MB':>9}{'build s':>9}{'ms/query':>10}{'recall':>9}{'speedup':>9}")
+    for r in report:
+        p = f"{r['param']}={r['value']}" if r["param"] else "-"
+        print(f"{r['index_type']:<28}{p:<14}{r['memory_mb']:>9.1f}{r['build_s']:>9.2f}{r['ms_per_query']:>10.3f}"
+              f"{r['recall']:>9.3f}{flat_ms / r['ms_per_query']:>8.1f}x")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"num_vectors": len(vecs), "k": k, "results": report}, f, indent=2)
+        print(f"📄 report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark for edge-sentence embedding throughput.
+
+Runs ``EdgeEmbedderFAISS.embed_texts`` against ``StubEmbeddingClient`` with a
+simulated per-request latency, once with one sentence per request (the old
+behaviour) and once per requested batch size.
+
+Usage:
+    python benchmark/bench_edge_embedding.py --dataset hotpotQA --limit 20000
+    python benchmark/bench_edge_embedding.py --gexf g.gexf --json g.json --latency 0.2
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from config import get_config
+from index.edge_embedding import EdgeEmbedderFAISS
+from index.stub_embedding import StubEmbeddingClient
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched edge embedding (offline)")
+    parser.add_argument("--dataset", help="Dataset name (uses config paths)")
+    parser.add_argument("--gexf", help="GEXF path (overrides --dataset)")
+    parser.add_argument("--json", help="Graph JSON path (overrides --dataset)")
+    parser.add_argument("--limit", type=int, default=5000, help="Number of edge sentences to embed")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated seconds per request")
+    parser.add_argument("--item-latency", type=float, default=0.0002, help="Simulated seconds per sentence")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 64, 256, 1024])
+    parser.add_argument("--dim", type=int, default=1536)
+    args = parser.parse_args()
+
+    if args.gexf and args.json:
+        gexf_path, json_path = args.gexf, args.json
+    elif args.dataset:
+        config = get_config(args.dataset)
+        gexf_path = str(config.get_graph_gexf_file())
+        json_path = str(config.get_graph_json_file())
+    else:
+        parser.error("--dataset or both --gexf and --json are required")
+
+    client = StubEmbeddingClient(dim=args.dim, request_latency=args.latency, item_latency=args.item_latency)
+    embedder = EdgeEmbedderFAISS(
+        gexf_path=gexf_path,
+        json_path=json_path,
+        embedding_model="stub",
+        openai_api_key=None,
+        index_path="",
+        payload_path="",
+        client=client,
+        cache_dir=None,
+        backend="stub",
+    )
+    texts = [e[4] for e in embedder.edges[: args.limit]]
+    print(f"📏 {len(texts)} sentences, latency={args.latency}s/request, {args.item_latency}s/item")
+
+    baseline = None
+    for bs in args.batch_sizes:
+        embedder.batch_size = bs
+        client.calls = client.items = 0
+        start = time.perf_counter()
+        vecs = embedder.embed_texts(texts, desc=f"batch={bs}")
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(
+            f"batch={bs:>5}  requests={client.calls:>7}  time={elapsed:8.2f}s  "
+            f"rate={len(texts) / elapsed:9.1f} sent/s  speedup={baseline / elapsed:6.1f}x  shape={vecs.shape}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Memory of N search processes with heap-loaded vs. memory-mapped edge indexes.
+
+Starts ``--processes`` workers that each open the same index + payload store,
+run a few searches and then wait for each other, so that all copies are alive
+at the same time. Every worker reports private anonymous memory (``RssAnon``)
+and its proportional share of resident memory (``Pss``, shared pages split
+across the processes that map them); the sum of Pss is what the machine pays.
+
+Usage:
+    python benchmark/bench_index_mmap.py --dataset hotpotQA --processes 8
+    python benchmark/bench_index_mmap.py --synthetic 400000 --dim 256 --types Flat HNSW32 "IVF1024,SQ8"
+"""
+
+import argparse
+import multiprocessing as mp
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from config import get_config
+from index.ann_index import build_ann_index, read_index
+from index.edge_embedding import normalize_rows
+
+
+def memory_kb():
+    """(RssAnon, Pss) of the current process in kB (Linux only)."""
+    anon = pss = 0
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("RssAnon:"):
+                anon = int(line.split()[1])
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            if line.startswith("Pss:"):
+                pss = int(line.split()[1])
+    return anon, pss
+
+
+def worker(index_path, payload_dir, use_mmap, queries, barrier, results):
+    before_anon, _ = memory_kb()
+    start = time.perf_counter()
+    index, mapped = read_index(index_path, mmap=use_mmap)
+    if payload_dir:
+        from index.payload_store import EdgePayloadStore
+        payloads = EdgePayloadStore(payload_dir)
+    load_s = time.perf_counter() - start
+    _D, I = index.search(queries, 10)
+    if payload_dir:
+        [payloads[int(r)] for r in I.ravel() if r >= 0]
+    barrier.wait()                       # every worker has its copy resident now
+    anon, pss = memory_kb()
+    results.put({"mapped": mapped, "load_s": load_s, "anon_mb": (anon - before_anon) / 1024, "pss_mb": pss / 1024})
+    barrier.wait()
+
+
+def run(index_path, payload_dir, use_mmap, n_proc, queries):
+    ctx = mp.get_context("spawn")
+    barrier, results = ctx.Barrier(n_proc), ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(index_path, payload_dir, use_mmap, queries, barrier, results))
+             for _ in range(n_proc)]
+    for p in procs:
+        p.start()
+    rows = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Heap vs. mmap edge index memory across processes")
+    parser.add_argument("--dataset", help="Dataset whose edge index + payload store is loaded")
+    parser.add_argument("--synthetic", type=int, help="Build synthetic indexes with N vectors instead")
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--types", nargs="+", default=["Flat", "HNSW32"], help="Index types for --synthetic")
+    parser.add_argument("--processes", type=int, default=4)
+    args = parser.parse_args()
+    if not (args.dataset or args.synthetic):
+        parser.error("--dataset or --synthetic is required")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        targets = []
+        if args.dataset:
+            config = get_config(args.dataset)
+            targets.append((args.dataset, str(config.get_edge_index_file()), str(config.get_edge_payload_file())))
+        else:
+            vecs = normalize_rows(np.random.default_rng(0).standard_normal((args.synthetic, args.dim)).astype("float32"))
+            for spec in args.types:
+                path = str(Path(tmp) / (spec.replace(",", "_") + ".faiss"))
+                faiss.write_index(build_ann_index(vecs, spec, 100000), path)
+                targets.append((spec, path, None))
+            del vecs
+
+        print(f"{'index':<16}{'load':<7}{'mapped':>7}{'load s':>9}{'anon MB/proc':>14}{'total Pss MB':>14}")
+        for name, index_path, payload_dir in targets:
+            d = faiss.read_index(index_path, getattr(faiss, "IO_FLAG_MMAP_IFC", 0)).d
+            queries = normalize_rows(np.random.default_rng(1).standard_normal((16, d)).astype("float32"))
+            for use_mmap in (False, True):
+                rows = run(index_path, payload_dir, use_mmap, args.processes, queries)
+                print(f"{name:<16}{'mmap' if use_mmap else 'heap':<7}{str(rows[0]['mapped']):>7}"
+                      f"{np.mean([r['load_s'] for r in rows]):>9.3f}"
+                      f"{np.mean([r['anon_mb'] for r in rows]):>14.1f}"
+                      f"{sum(r['pss_mb'] for r in rows):>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Prompt-token and recall report for embedding shortlists of topic / subtopic labels.
+
+For every question the topic-choice LLM is first run on the full label list
+(the baseline). Each shortlist size N then reports
+
+* prompt tokens of ``TOPIC_CHOICE_PROMPT`` with the N shortlisted labels vs. all labels,
+* recall: share of the baseline's chosen topics that are inside the shortlist
+  (the LLM cannot pick a topic that was cut), and the share of questions
+  whose baseline choice survives completely.
+
+With ``--rerun`` the LLM is also asked again with each shortlist, adding its
+latency and the overlap of that final choice with the baseline.
+
+``--level subtopic`` does the same for ``SUBTOPIC_CHOICE_PROMPT``: one row per
+(question, baseline topic), the baseline being the subtopic-choice LLM over all
+children of that topic. Its table also reports the mean fan-out (children per
+topic), which the full prompt grows with and the shortlisted one does not.
+
+Baseline choices are written into the ``--json`` report; pass the report back
+with ``--baseline`` to re-run other sizes (or embedding models) without calling
+the LLM for the baseline again.
+
+Usage:
+    python benchmark/bench_label_shortlist.py --dataset hotpotQA --sizes 20 50 100 --questions 50 --json topics.json
+    python benchmark/bench_label_shortlist.py --dataset hotpotQA --baseline topics.json --sizes 10 30
+    python benchmark/bench_label_shortlist.py --dataset hotpotQA --baseline topics.json --level subtopic --sizes 30 60
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from openai import OpenAI
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from config import get_config
+from index.edge_embedding import (
+    EMBED_BACKEND, EMBEDDING_MODEL, OPENAI_API_KEY, EdgeEmbedderFAISS, count_tokens,
+)
+from index.graph_snapshot import load_graph, node_label_map
+from index.label_index import LabelIndex, build_label_index, label_index_dir_for
+from index.subtopic_choice import build_subtopic_prompt, choose_subtopics_for_topic, extract_subtopics_for_topic
+from index.topic_choice import build_topic_prompt, choose_topics_from_graph, extract_graph_topic_labels
+
+
+def timed_choice(question, graph, client, candidates=None):
+    start = time.perf_counter()
+    chosen = choose_topics_from_graph(question, graph, client, candidates=candidates)
+    return chosen, time.perf_counter() - start
+
+
+def timed_sub_choice(question, topic_nid, graph, client, candidates=None):
+    start = time.perf_counter()
+    chosen = choose_subtopics_for_topic(
+        question=question, topic_nid=topic_nid, graph=graph, client=client, candidates=candidates,
+    )
+    return chosen, time.perf_counter() - start
+
+
+def score_row(base, shortlist):
+    """(recall, complete) of the baseline choice *base* within *shortlist*."""
+    kept = set(base) & set(shortlist)
+    return (len(kept) / len(set(base)) if base else 1.0), len(kept) == len(set(base))
+
+
+def jaccard(a, b):
+    return len(set(a) & set(b)) / max(len(set(a) | set(b)), 1)
+
+
+def print_table(report, extra=None):
+    head = f"{'N':>6}{'tokens':>9}{'saved':>8}{'recall':>8}{'complete':>10}{'llm s':>8}{'jaccard':>9}"
+    print(head + (f"{extra:>12}" if extra else ""))
+    for r in report:
+        llm = f"{r['llm_seconds']:.2f}" if r["llm_seconds"] is not None else "-"
+        jac = f"{r['jaccard_vs_baseline']:.3f}" if r["jaccard_vs_baseline"] is not None else "-"
+        print(f"{r['size']:>6}{r['prompt_tokens']:>9.0f}{r['token_reduction']:>7.1%}{r['recall']:>8.3f}"
+              f"{r['complete']:>10.2f}{llm:>8}{jac:>9}" + (f"{r[extra]:>12.1f}" if extra else ""))
+
+
+def summarize(n, tokens, full_tokens, recall, complete, seconds, overlap, **extra):
+    return {
+        "size": n,
+        "prompt_tokens": float(np.mean(tokens)) if tokens else 0.0,
+        "token_reduction": 1 - float(np.sum(tokens)) / float(np.sum(full_tokens)) if full_tokens else 0.0,
+        "recall": float(np.mean(recall)) if recall else 1.0,
+        "complete": float(np.mean(complete)) if complete else 1.0,
+        "llm_seconds": float(np.mean(seconds)) if seconds else None,
+        "jaccard_vs_baseline": float(np.mean(overlap)) if overlap else None,
+        **extra,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt tokens / recall of topic / subtopic label shortlists")
+    parser.add_argument("--dataset", required=True, help="Dataset name (graph, QA file and edge index paths)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 50, 100], help="Shortlist sizes N")
+    parser.add_argument("--questions", type=int, default=50, help="Number of QA questions")
+    parser.add_argument("--backend", default=EMBED_BACKEND, choices=["openai", "local", "stub"],
+                        help="Embedding backend for labels and questions")
+    parser.add_argument("--baseline", help="Earlier --json report whose baseline topic choices are reused")
+    parser.add_argument("--level", default="topic", choices=["topic", "subtopic"],
+                        help="Shortlist topics (TOPIC_SHORTLIST_SIZE) or each chosen topic's subtopics")
+    parser.add_argument("--rerun", action="store_true", help="Also run the choice LLM on each shortlist")
+    parser.add_argument("--json", help="Write the report as JSON to this path")
+    args = parser.parse_args()
+
+    config = get_config(args.dataset)
+    gexf_path = config.get_graph_gexf_file()
+    graph = load_graph(gexf_path)
+    with open(config.get_qa_file(), encoding="utf-8") as f:
+        questions = [item.get("query", "") for item in json.load(f)][: args.questions]
+
+    embedder = EdgeEmbedderFAISS(
+        gexf_path=str(gexf_path),
+        json_path=str(config.get_graph_json_file()),
+        embedding_model=EMBEDDING_MODEL,
+        openai_api_key=OPENAI_API_KEY,
+        index_path=str(config.get_edge_index_file()),
+        payload_path=str(config.get_edge_payload_file()),
+        backend=args.backend,
+        graph=graph,
+    )
+    label_dir = label_index_dir_for(gexf_path)
+    if not LabelIndex.exists(label_dir) or LabelIndex(label_dir).meta["model"] != embedder.model_id:
+        build_label_index(graph, embedder, label_dir)
+    labels = LabelIndex(label_dir, model_id=embedder.model_id)
+    all_labels = extract_graph_topic_labels(graph)
+    q_mat = embedder.embed_queries(questions)
+
+    # 1) baseline: LLM over the full topic list
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            cached = {b["query"]: b for b in json.load(f)["baseline"]}
+        baseline = [cached[q] for q in questions]
+    missing_subs = args.level == "subtopic" and (
+        baseline is None or any(set(b["topics"]) - set(b.get("subtopics", {})) for b in baseline)
+    )
+    client = OpenAI(api_key=OPENAI_API_KEY) if (args.rerun or baseline is None or missing_subs) else None
+    if baseline is None:
+        baseline = []
+        for q in questions:
+            chosen, seconds = timed_choice(q, graph, client)
+            baseline.append({"query": q, "topics": chosen, "seconds": seconds})
+
+    if args.level == "subtopic":
+        subtopic_report(args, graph, labels, client, questions, q_mat, baseline)
+        return
+
+    full_tokens = [count_tokens(build_topic_prompt(q, all_labels)) for q in questions]
+
+    # 2) shortlists
+    report = []
+    for n in args.sizes:
+        tokens, recall, complete, overlap, seconds = [], [], [], [], []
+        for q, q_vec, base in zip(questions, q_mat, baseline):
+            shortlist = labels.shortlist_topics(q_vec, n)
+            tokens.append(count_tokens(build_topic_prompt(q, shortlist)))
+            r, c = score_row(base["topics"], shortlist)
+            recall.append(r)
+            complete.append(c)
+            if args.rerun:
+                chosen, s = timed_choice(q, graph, client, candidates=shortlist)
+                seconds.append(s)
+                overlap.append(jaccard(chosen, base["topics"]))
+        report.append(summarize(n, tokens, full_tokens, recall, complete, seconds, overlap))
+
+    base_s = [b["seconds"] for b in baseline if b.get("seconds") is not None]
+    print(f"\n{len(questions)} questions, {len(all_labels)} topic labels, "
+          f"full-list prompt {np.mean(full_tokens):.0f} tokens"
+          + (f", {np.mean(base_s):.2f}s per LLM call" if base_s else ""))
+    print_table(report)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"num_topics": len(all_labels), "full_prompt_tokens": float(np.mean(full_tokens)),
+                       "baseline": baseline, "results": report}, f, indent=2, ensure_ascii=False)
+        print(f"📄 report written to {args.json}")
+
+
+def subtopic_report(args, graph, labels, client, questions, q_mat, baseline):
+    """``--level subtopic``: one row per (question, baseline topic)."""
+    topic_nid = node_label_map(graph, "topic")
+    rows = []   # (question, q_vec, topic label, topic nid, baseline entry)
+    for q, q_vec, base in zip(questions, q_mat, baseline):
+        subs = base.setdefault("subtopics", {})
+        sub_s = base.setdefault("subtopic_seconds", {})
+        for t in base["topics"]:
+            t_id = topic_nid.get(t)
+            if t_id is None:
+                continue
+            if t not in subs:   # baseline: LLM over every child of the topic
+                subs[t], sub_s[t] = timed_sub_choice(q, t_id, graph, client)
+            rows.append((q, q_vec, t, t_id, base))
+
+    full_tokens, fanout = [], []
+    for q, _v, t, t_id, _b in rows:
+        children = [lbl for _nid, lbl in extract_subtopics_for_topic(graph, t_id)]
+        full_tokens.append(count_tokens(build_subtopic_prompt(q, t, children)))
+        fanout.append(len(children))
+
+    report = []
+    for n in args.sizes:
+        tokens, recall, complete, overlap, seconds = [], [], [], [], []
+        for q, q_vec, t, t_id, base in rows:
+            cands = labels.shortlist_subtopics(t_id, q_vec, n)
+            if cands is None:   # label index older than the graph
+                cands = extract_subtopics_for_topic(graph, t_id)
+            shortlist = [lbl for _nid, lbl in cands]
+            tokens.append(count_tokens(build_subtopic_prompt(q, t, shortlist)))
+            r, c = score_row(base["subtopics"][t], shortlist)
+            recall.append(r)
+            complete.append(c)
+            if args.rerun:
+                chosen, s = timed_sub_choice(q, t_id, graph, client, candidates=cands)
+                seconds.append(s)
+                overlap.append(jaccard(chosen, base["subtopics"][t]))
+        report.append(summarize(n, tokens, full_tokens, recall, complete, seconds, overlap,
+                                candidates=float(np.mean([min(f, n) for f in fanout])) if fanout else 0.0))
+
+    base_s = [s for b in baseline for s in b.get("subtopic_seconds", {}).values() if s is not None]
+    print(f"\n{len(questions)} questions, {len(rows)} (question, topic) pairs, "
+          f"fan-out mean {np.mean(fanout) if fanout else 0:.1f} / max {max(fanout, default=0)}, "
+          f"full-list prompt {np.mean(full_tokens) if full_tokens else 0:.0f} tokens"
+          + (f", {np.mean(base_s):.2f}s per LLM call" if base_s else ""))
+    print_table(report, extra="candidates")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"level": "subtopic", "pairs": len(rows), "mean_fanout": float(np.mean(fanout)) if fanout else 0.0,
+                       "full_prompt_tokens": float(np.mean(full_tokens)) if full_tokens else 0.0,
+                       "baseline": baseline, "results": report}, f, indent=2, ensure_ascii=False)
+        print(f"📄 report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
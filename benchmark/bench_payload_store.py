@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Startup cost of pickled ``.npy`` payloads vs. the columnar payload store.
+
+Writes the same synthetic payloads in both formats, then loads each one in a
+fresh subprocess and reports wall time and resident-memory growth (Linux
+``/proc/self/status``), plus the cost of materialising a search result page.
+
+Usage:
+    python benchmark/bench_payload_store.py --rows 500000
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from index.payload_store import make_edge_id, write_payload_store
+
+LOADERS = {
+    "pickled .npy": """
+payloads = np.load(PATH, allow_pickle=True).tolist()
+page = [payloads[r] for r in ROWS]
+""",
+    "columnar store": """
+from index.payload_store import EdgePayloadStore
+payloads = EdgePayloadStore(PATH)
+page = [payloads[r] for r in ROWS]
+""",
+}
+
+CHILD = """
+import sys, time, json
+sys.path.insert(0, {root!r})
+import numpy as np
+
+def rss_kb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+PATH, ROWS = {path!r}, list(range(0, {rows}, max({rows} // 50, 1)))
+before = rss_kb()
+start = time.perf_counter()
+{body}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "rss_mb": (rss_kb() - before) / 1024}}))
+"""
+
+
+def synthetic_payloads(n_rows: int, n_nodes: int):
+    rng = np.random.default_rng(0)
+    for row in range(n_rows):
+        edges = []
+        for _ in range(1 + (rng.random() < 0.1)):
+            src, dst = (f"entity_{x}" for x in rng.integers(0, n_nodes, 2))
+            lbl = f"relation {rng.integers(0, 500)}"
+            edges.append({"edge_id": make_edge_id(src, dst, lbl, 0), "source": src, "target": dst, "label": lbl})
+        yield {"sentence": f"Sentence number {row} describing {edges[0]['source']} and friends.",
+               "chunk_id": int(rng.integers(0, n_rows // 10 + 1)), "edges": edges}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Payload store startup benchmark")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--nodes", type=int, default=50000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        payloads = list(synthetic_payloads(args.rows, args.nodes))
+        npy_path = str(Path(tmp) / "payloads.npy")
+        np.save(npy_path, np.array(payloads, dtype=object))
+        store_path = str(write_payload_store(Path(tmp) / "payloads", payloads))
+        del payloads
+
+        print(f"{args.rows} rows")
+        for name, path in [("pickled .npy", npy_path), ("columnar store", store_path)]:
+            code = CHILD.format(root=str(PROJECT_ROOT), path=path, rows=args.rows, body=LOADERS[name])
+            out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+            res = json.loads(out.stdout.strip().splitlines()[-1])
+            print(f"{name:<16} load+page {res['seconds']:8.3f}s   RSS +{res['rss_mb']:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
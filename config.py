@@ -44,6 +44,11 @@ class KGRAGConfig:
         # Model settings
         self.default_model = os.getenv("DEFAULT_MODEL", "gpt-4o-mini")
         self.embed_model = os.getenv("EMBED_MODEL", "text-embedding-3-small")
+        # Embedding backend for EMBED_MODEL: openai | local (sentence-transformers) | stub
+        self.embed_backend = os.getenv("EMBED_BACKEND", "openai")
+        self.embed_local_device = os.getenv("EMBED_LOCAL_DEVICE", "cpu")
+        self.embed_local_batch_size = int(os.getenv("EMBED_LOCAL_BATCH_SIZE", "64"))
+        self.embed_local_processes = int(os.getenv("EMBED_LOCAL_PROCESSES", "0"))
         self.chat_model = os.getenv("CHAT_MODEL", "gpt-4o-mini")
         self.eval_model = os.getenv("EVAL_MODEL", "gpt-4o-mini")
         
@@ -64,8 +69,12 @@ class KGRAGConfig:
         # Topic/subtopic selection settings
         self.topic_choice_min = int(os.getenv("TOPIC_CHOICE_MIN", "5"))
         self.topic_choice_max = int(os.getenv("TOPIC_CHOICE_MAX", "10"))
+        # Embedding shortlist of topic labels sent to the topic-choice LLM (0 = send every label)
+        self.topic_shortlist_size = int(os.getenv("TOPIC_SHORTLIST_SIZE", "0"))
         self.subtopic_choice_min = int(os.getenv("SUBTOPIC_CHOICE_MIN", "10"))
         self.subtopic_choice_max = int(os.getenv("SUBTOPIC_CHOICE_MAX", "25"))
+        # Embedding shortlist of a topic's subtopics sent to the subtopic-choice LLM (0 = all children)
+        self.subtopic_shortlist_size = int(os.getenv("SUBTOPIC_SHORTLIST_SIZE", "0"))
         
         # Retry settings
         self.max_retries = int(os.getenv("MAX_RETRIES", "10"))
@@ -78,6 +87,47 @@ class KGRAGConfig:
         self.top_k2_long = int(os.getenv("TOP_K2_LONG", "5"))
         self.embedding_top_k = int(os.getenv("EMBEDDING_TOP_K", "5"))
         self.overretrieve_factor = int(os.getenv("OVERRETRIEVE_FACTOR", "5"))
+        # Entity filter strategy: "native" (search only candidate rows), "overretrieve"
+        # (fixed multiplier) or "adaptive" (grow k until top_k filtered hits)
+        self.filter_mode = os.getenv("FILTER_MODE", "native")
+        self.adaptive_start_factor = int(os.getenv("ADAPTIVE_START_FACTOR", "2"))
+        self.adaptive_growth = int(os.getenv("ADAPTIVE_GROWTH", "2"))
+        self.filter_exact_max_rows = int(os.getenv("FILTER_EXACT_MAX_ROWS", "20000"))
+        
+        # Edge embedding batching (count- and token-bounded requests)
+        self.embed_batch_size = int(os.getenv("EMBED_BATCH_SIZE", "256"))
+        self.embed_batch_max_tokens = int(os.getenv("EMBED_BATCH_MAX_TOKENS", "100000"))
+        self.embed_cache_dir = Path(os.getenv("EMBED_CACHE_DIR", str(self.temp_dir / "embedding_cache")))
+        # Query embedding LRU (0 = off) and optional directory persisting it across runs
+        self.query_cache_size = int(os.getenv("QUERY_CACHE_SIZE", "4096"))
+        self.query_cache_dir = os.getenv("QUERY_CACHE_DIR") or None
+        
+        # Edge ANN index (faiss.index_factory string) and its query-time parameters
+        self.edge_index_type = os.getenv("EDGE_INDEX_TYPE", "Flat")
+        self.edge_index_nprobe = int(os.getenv("EDGE_INDEX_NPROBE", "32"))
+        self.edge_index_ef_search = int(os.getenv("EDGE_INDEX_EF_SEARCH", "128"))
+        self.edge_index_train_size = int(os.getenv("EDGE_INDEX_TRAIN_SIZE", "200000"))
+        # Sentences per on-disk shard of a resumable index build
+        self.edge_build_shard_size = int(os.getenv("EDGE_BUILD_SHARD_SIZE", "50000"))
+        # Vector storage: float32 | float16 | int8 | raw faiss code (e.g. PQ64)
+        # (a Flat index with PQ codes has no IDSelector support: native filtering scores candidates exactly)
+        self.edge_vector_storage = os.getenv("EDGE_VECTOR_STORAGE", "float32")
+        # Exact float32 re-ranking of top_k * factor candidates for quantised indexes (0 = off)
+        self.edge_rerank_factor = int(os.getenv("EDGE_RERANK_FACTOR", "0"))
+        # Memory-map the index on load so worker processes share one page-cache copy
+        self.edge_index_mmap = os.getenv("EDGE_INDEX_MMAP", "false").lower() == "true"
+
+        # json_to_gexf assembly: worker processes (0/1 = serial) and triples per shard
+        self.graph_build_workers = int(os.getenv("GRAPH_BUILD_WORKERS", "0"))
+        self.graph_build_shard_size = int(os.getenv("GRAPH_BUILD_SHARD_SIZE", "100000"))
+        # Query-time graph: snapshot (mmap, falls back to GEXF) | interned (in-memory ServingGraph)
+        # | sqlite (disk-backed GraphStore, for graphs larger than RAM)
+        self.graph_serving_format = os.getenv("GRAPH_SERVING_FORMAT", "snapshot")
+        # Entries (node rows + typed neighbour lists) in the GraphStore hot-node LRU
+        self.graph_store_cache_size = int(os.getenv("GRAPH_STORE_CACHE_SIZE", "100000"))
+        # Topic-partitioned graph + edge index shards (index/graph_partition.py) for retrieval
+        self.use_graph_shards = os.getenv("USE_GRAPH_SHARDS", "false").lower() == "true"
+        self.graph_num_shards = int(os.getenv("GRAPH_NUM_SHARDS", "8"))
         
         # Context settings
         self.max_context_length = int(os.getenv("MAX_CONTEXT_LENGTH", "4000"))
@@ -138,9 +188,14 @@ class KGRAGConfig:
         return self.index_results_dir / f"{name}_edge_index.faiss"
     
     def get_edge_payload_file(self, dataset_name: str = None) -> Path:
-        """Return edge payload file path."""
+        """Return edge payload store path (a directory of memory-mappable arrays)."""
+        name = dataset_name or self.dataset_name
+        return self.index_results_dir / f"{name}_edge_payloads"
+    
+    def get_graph_shards_dir(self, dataset_name: str = None) -> Path:
+        """Return the directory of the topic-partitioned graph/index shards."""
         name = dataset_name or self.dataset_name
-        return self.index_results_dir / f"{name}_edge_payloads.npy"
+        return self.index_results_dir / f"{name}_shards"
     
     def get_answer_file(self, dataset_name: str = None, answer_type: str = "short") -> Path:
         """Return answer generation result file path."""
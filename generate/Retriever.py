@@ -11,6 +11,7 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 import networkx as nx
+import numpy as np
 from openai import OpenAI
 from dotenv import load_dotenv
 
@@ -19,6 +20,12 @@ PROJECT_ROOT = Path(__file__).parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
 
 from index.edge_embedding import EdgeEmbedderFAISS
+from index.graph_snapshot import SnapshotGraph, node_label_map
+from index.graph_store import GraphStore
+from index.serving_graph import ServingGraph, open_serving_graph
+from index.graph_hierarchy import hierarchy_for
+from index.label_index import LabelIndex, label_index_dir_for
+from index.graph_partition import ShardSet
 from index.topic_choice import choose_topics_from_graph
 from index.subtopic_choice import choose_subtopics_for_topic
 
@@ -50,13 +57,26 @@ class Retriever:
         client: OpenAI | None = None,
         *,
         thread_workers: int = 10,
+        shards_dir: str | None = None,
     ) -> None:
         if not openai_api_key:
             raise ValueError("OPENAI_API_KEY is required")
 
         print("📖  loading graph …", end=" ")
-        self.graph = nx.read_gexf(gexf_path)
-        print(f"done ({self.graph.number_of_nodes()} nodes)")
+        # shards_dir: topic shards (index/graph_partition.py) – only the router graph is loaded here,
+        # each shard's graph + index on the first query that picks one of its topics
+        self.shards = ShardSet(shards_dir, json_path, embedding_model, openai_api_key) if shards_dir else None
+        if self.shards is not None:
+            self.graph = self.shards.router
+            source = f"router of {len(self.shards)} shards"
+        else:
+            # GRAPH_SERVING_FORMAT: mmap snapshot (else GEXF), compact in-memory ServingGraph
+            # or disk-backed GraphStore (SQLite + hot-node cache)
+            self.graph = open_serving_graph(gexf_path)
+            source = ("interned" if isinstance(self.graph, ServingGraph)
+                      else "sqlite" if isinstance(self.graph, GraphStore)
+                      else "snapshot" if isinstance(self.graph, SnapshotGraph) else "gexf")
+        print(f"done ({self.graph.number_of_nodes()} nodes, {source})")
 
         # kv-store 로딩 (chunk id map도 여기서 준비)
         with open(kv_json_path, encoding="utf-8") as f:
@@ -68,84 +88,186 @@ class Retriever:
 
         self.client = client or OpenAI(api_key=openai_api_key)
 
-        self.embedder = EdgeEmbedderFAISS(
-            gexf_path=gexf_path,
-            json_path=json_path,
-            embedding_model=embedding_model,
-            openai_api_key=openai_api_key,
-            index_path=index_path,
-            payload_path=payload_path,
-        )
-        if os.path.exists(index_path):
-            self.embedder.load_index()
-            print("✅  FAISS index loaded\n")
+        if self.shards is not None:
+            self.embedder = self.shards.query_embedder   # embeds queries; searches go to the shards
+        else:
+            self.embedder = EdgeEmbedderFAISS(
+                gexf_path=gexf_path,
+                json_path=json_path,
+                embedding_model=embedding_model,
+                openai_api_key=openai_api_key,
+                index_path=index_path,
+                payload_path=payload_path,
+                graph=self.graph,   # same GEXF – don't parse it twice
+            )
+            if os.path.exists(index_path):
+                self.embedder.load_index()
+                print("✅  FAISS index loaded\n")
 
-        self.topic_lbl2nid = {
-            d["label"]: n for n, d in self.graph.nodes(data=True) if d.get("type") == "topic"
-        }
-        self.sub_lbl2nid = {
-            d["label"]: n for n, d in self.graph.nodes(data=True) if d.get("type") == "subtopic"
-        }
+        self.topic_lbl2nid = node_label_map(self.graph, "topic")
+        self.sub_lbl2nid = node_label_map(self.graph, "subtopic")
+        # topic → subtopic → entity posting lists, built once instead of per query
+        self.hierarchy = hierarchy_for(self.graph)
 
         self.thread_workers = thread_workers
 
-    def retrieve(self, query: str, top_k1: int = None, top_k2: int = None) -> Dict[str, List[str]]:
+        # TOPIC_ / SUBTOPIC_SHORTLIST_SIZE: prompt only the labels closest to the query
+        from config import get_config
+        config = get_config()
+        # never fewer candidates than the LLM may pick
+        self.topic_shortlist = config.topic_shortlist_size and max(config.topic_shortlist_size, config.topic_choice_max)
+        self.subtopic_shortlist = (config.subtopic_shortlist_size
+                                   and max(config.subtopic_shortlist_size, config.subtopic_choice_max))
+        self.label_index = None
+        label_dir = label_index_dir_for(gexf_path)
+        if self.topic_shortlist or self.subtopic_shortlist:
+            if LabelIndex.exists(label_dir):
+                self.label_index = LabelIndex(label_dir, model_id=self.embedder.model_id)
+                print(f"🏷️  shortlists: {self.topic_shortlist or 'all'} of {len(self.label_index.topic_labels)} topics, "
+                      f"{self.subtopic_shortlist or 'all'} subtopics per topic")
+            else:
+                print(f"⚠️  shortlist size set but no label index at {label_dir} – using every topic / subtopic")
+
+    def query_vector(self, query: str) -> np.ndarray | None:
+        """Query embedding for the label shortlists (None when they are off).
+
+        Callers pass it on to the edge search, so the query is embedded once
+        even with QUERY_CACHE_SIZE=0.
+        """
+        if self.label_index is None:
+            return None
+        return self.embedder.embed_queries([query])[0]
+
+    def shortlist_topics(self, q_vec: np.ndarray | None) -> List[str] | None:
+        """Topic labels offered to the topic-choice LLM (None = all of them)."""
+        if q_vec is None or not self.topic_shortlist:
+            return None
+        return self.label_index.shortlist_topics(q_vec, self.topic_shortlist)
+
+    def shortlist_subtopics(self, topic_nid: str, q_vec: np.ndarray | None):
+        """``[(sub_nid, label), ...]`` offered to the subtopic-choice LLM (None = every child)."""
+        if q_vec is None or not self.subtopic_shortlist:
+            return None
+        return self.label_index.shortlist_subtopics(topic_nid, q_vec, self.subtopic_shortlist)
+
+    def _resolve_top_k(self, top_k1: int | None, top_k2: int | None):
         # 기본값 설정
-        if top_k1 is None:
+        if top_k1 is None or top_k2 is None:
             from config import get_config
             config = get_config()
-            top_k1 = config.top_k1
-        if top_k2 is None:
-            from config import get_config
-            config = get_config()
-            top_k2 = config.top_k2
-            
-        print("=== Retrieval ===")
-        topics = choose_topics_from_graph(query, self.graph, self.client)
+            top_k1 = config.top_k1 if top_k1 is None else top_k1
+            top_k2 = config.top_k2 if top_k2 is None else top_k2
+        return top_k1, top_k2
+
+    def select_entities(self, query: str, q_vec: np.ndarray | None = None):
+        """LLM topic → subtopic 선택 후 그 아래 entity 집합을 모읍니다.
+
+        샤드 모드에서는 entity 집합 대신 ``{shard: entity 집합}``을 돌려줍니다.
+        *q_vec*는 호출자가 이미 임베딩한 쿼리 벡터 (shortlist용, 없으면 여기서 구함).
+        """
+        if q_vec is None:
+            q_vec = self.query_vector(query)
+        topics = choose_topics_from_graph(query, self.graph, self.client, candidates=self.shortlist_topics(q_vec))
         print("topics:", topics)
 
         chosen_subtopics: dict[str, List[str]] = defaultdict(list)
         entities: Set[str] = set()
+        shard_entities: Dict[int, Set[str]] = defaultdict(set)
 
         def _process_topic(t: str):
             t_id = self.topic_lbl2nid.get(t)
             if t_id is None:
-                return t, [], set()
+                return t, [], set(), None
 
             subs_dict = choose_subtopics_for_topic(
                 question=query,
                 topic_nid=t_id,
                 graph=self.graph,
                 client=self.client,
+                candidates=self.shortlist_subtopics(t_id, q_vec),
             )
             # print(f"Subtopics for {t}:", subs_dict)
             subs = subs_dict
 
-            ent_set: Set[str] = set()
-            for sub_lbl in subs:
-                sub_id = self.sub_lbl2nid.get(sub_lbl)
-                if sub_id:
-                    ent_set |= {
-                        nb
-                        for nb in self.graph.neighbors(sub_id)
-                        if self.graph.nodes[nb].get("type") == "entity"
-                    }
-            return t, subs, ent_set
-
-        max_workers = min(self.thread_workers, len(topics))
+            sub_nids = [self.sub_lbl2nid.get(sub_lbl) for sub_lbl in subs]
+            if self.shards is not None:
+                shard, ent_set = self.shards.entities_under(t_id, sub_nids)
+                return t, subs, ent_set, shard
+            return t, subs, self.hierarchy.entities_under(sub_nids), None
+
+        max_workers = max(1, min(self.thread_workers, len(topics)))
         with ThreadPoolExecutor(max_workers=max_workers) as pool:
             futures = [pool.submit(_process_topic, t) for t in topics]
             for fut in as_completed(futures):
-                t, subs, ent_set = fut.result()
+                t, subs, ent_set, shard = fut.result()
                 chosen_subtopics[t] = subs
+                if shard is not None and ent_set:
+                    shard_entities[shard] |= ent_set
                 entities |= ent_set
 
+        if self.shards is not None:
+            return topics, chosen_subtopics, dict(shard_entities)
+        return topics, chosen_subtopics, entities
+
+    def retrieve(self, query: str, top_k1: int = None, top_k2: int = None) -> Dict[str, List[str]]:
+        top_k1, top_k2 = self._resolve_top_k(top_k1, top_k2)
+
+        print("=== Retrieval ===")
+        q_vec = self.query_vector(query)   # shortlists on: embedded once, reused by the edge search
+        topics, chosen_subtopics, entities = self.select_entities(query, q_vec)
+
         if not entities:
             print("🚫 no entities → abort")
             return {}
 
-        edges = self.embedder.search(query, top_k=top_k1, filter_entities=entities)
+        if self.shards is not None:
+            q_mat = q_vec[None, :] if q_vec is not None else self.embedder.embed_queries([query])
+            edges = self.shards.search_vectors(q_mat, [entities], top_k=top_k1)[0]
+        else:
+            edges = self.embedder.search(query, top_k=top_k1, filter_entities=entities, query_vec=q_vec)
+        return self._pack_result(edges, topics, chosen_subtopics, top_k2)
+
+    def retrieve_many(self, queries: List[str], top_k1: int = None, top_k2: int = None) -> List[Dict]:
+        """``retrieve`` for a batch of queries.
+
+        Topic/subtopic selection still runs per query (in parallel threads), but
+        the edge search for the whole batch is a single ``embedder.search_many``
+        call: one batched embedding request and one multi-row FAISS search.
+        """
+        top_k1, top_k2 = self._resolve_top_k(top_k1, top_k2)
+
+        print(f"=== Retrieval ({len(queries)} queries) ===")
+        # shortlists need the vectors before selection: embed the batch once, reuse it for the edge search
+        q_mat = self.embedder.embed_queries(queries) if self.label_index is not None else None
+        with ThreadPoolExecutor(max_workers=max(1, min(self.thread_workers, len(queries)))) as pool:
+            selections = list(pool.map(
+                self.select_entities, queries, q_mat if q_mat is not None else [None] * len(queries),
+            ))
+
+        todo = [i for i, (_t, _s, ents) in enumerate(selections) if ents]
+        if self.shards is not None:
+            # scatter-gather: one batched embedding, each shard searched only by the queries that chose it
+            hits = self.shards.search_vectors(
+                q_mat[todo] if q_mat is not None else self.embedder.embed_queries([queries[i] for i in todo]),
+                [selections[i][2] for i in todo],
+                top_k=top_k1,
+            )
+        elif q_mat is not None:
+            hits = self.embedder.search_vectors(q_mat[todo], [selections[i][2] for i in todo], top_k=top_k1)
+        else:
+            hits = self.embedder.search_many(
+                [queries[i] for i in todo],
+                filters=[selections[i][2] for i in todo],
+                top_k=top_k1,
+            )
+
+        results: List[Dict] = [{} for _ in queries]   # no entities → {} (same as retrieve)
+        for i, edges in zip(todo, hits):
+            topics, chosen_subtopics, _ents = selections[i]
+            results[i] = self._pack_result(edges, topics, chosen_subtopics, top_k2)
+        return results
 
+    def _pack_result(self, edges: List[Dict], topics, chosen_subtopics, top_k2: int) -> Dict:
         chunk_ids: List[str] = []
         seen: Set[str] = set()
 
@@ -188,6 +310,8 @@ class Retriever:
             simplified_edges.append({
                 "source": e.get("source"),
                 "target": e.get("target"),
+                "label": e.get("label"),
+                "edges": e.get("edges", []),
                 "sentence": e.get("sentence"),
                 "score": e.get("score"),
                 "rank": e.get("rank"),
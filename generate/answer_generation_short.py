@@ -20,8 +20,10 @@ enc = tiktoken.encoding_for_model("gpt-4o")
 MAX_WORKERS = 30  # Number of parallel processing threads
 TOP_K1 = 30
 TOP_K2 = 5
+SEARCH_BATCH_SIZE = 0  # >0: retrieve this many questions per search_many call
 
-def main(dataset_name: str, input_path_param: str = None, output_path_param: str = None):
+def main(dataset_name: str, input_path_param: str = None, output_path_param: str = None,
+         batch_size: int = SEARCH_BATCH_SIZE):
     """
     Main function for answer generation (short)
     
@@ -29,6 +31,7 @@ def main(dataset_name: str, input_path_param: str = None, output_path_param: str
         dataset_name: Dataset name
         input_path_param: Input file path (optional)
         output_path_param: Output file path (optional)
+        batch_size: Questions per batched edge search (0 = one search per question)
     """
     config = get_config(dataset_name)
     
@@ -58,6 +61,21 @@ def main(dataset_name: str, input_path_param: str = None, output_path_param: str
     # Result storage list (preserve index order)
     output_data = [None] * len(questions)
 
+    def make_result(query, answer, spent, context_token, chunk_ids):
+        # 기록
+        for cid in chunk_ids:
+            log_entry = {"query": query, "chunk_id": cid}
+            chunk_log_file.write(json.dumps(log_entry, ensure_ascii=False) + "\n")
+
+        return {
+            "query": query,
+            "result": answer,
+            "meta": {
+                "total_spent": spent,
+                "context_token": context_token
+            }
+        }
+
     # 작업 함수
     def process(index_query):
         idx, item = index_query
@@ -71,20 +89,7 @@ def main(dataset_name: str, input_path_param: str = None, output_path_param: str
             context_token = None
             chunk_ids = []
 
-        # 기록
-        for cid in chunk_ids:
-            log_entry = {"query": query, "chunk_id": cid}
-            chunk_log_file.write(json.dumps(log_entry, ensure_ascii=False) + "\n")
-
-        result = {
-            "query": query,
-            "result": answer,
-            "meta": {
-                "total_spent": spent,
-                "context_token": context_token
-            }
-        }
-        return idx, result
+        return idx, make_result(query, answer, spent, context_token, chunk_ids)
 
     # Sentence chunk IDs logging (추가적)
     sentence_chunk_ids = set(getattr(rag, "all_sentence_chunk_ids", []))
@@ -92,18 +97,35 @@ def main(dataset_name: str, input_path_param: str = None, output_path_param: str
         log_entry = {"query": "global", "sentence_chunk_id": cid}
         chunk_log_file.write(json.dumps(log_entry, ensure_ascii=False) + "\n")
 
-    # 병렬 처리
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = [executor.submit(process, (i, item)) for i, item in enumerate(questions)]
-        
-        for future in tqdm(as_completed(futures), total=len(futures), desc="Processing"):
-            idx, result = future.result()
-            output_data[idx] = result  # 순서 유지
-            
-            # 중간 저장 (10개마다)
-            if idx % 10 == 0:
-                with open(temp_output_path, 'w', encoding='utf-8') as f:
-                    json.dump(output_data, f, indent=2, ensure_ascii=False)
+    if batch_size > 0:
+        # 배치 처리: 질문 batch_size개씩 검색을 묶고 답변 생성만 병렬
+        for start in tqdm(range(0, len(questions), batch_size), desc="Processing batches"):
+            block = questions[start:start + batch_size]
+            queries = [item.get("query", "") for item in block]
+            try:
+                answers = rag.answer_many(queries, top_k1=TOP_K1, top_k2=TOP_K2, max_workers=MAX_WORKERS)
+            except Exception as e:
+                answers = [(f"[Error] {e}", 0.0, None, [])] * len(queries)
+            for i, (query, res) in enumerate(zip(queries, answers)):
+                output_data[start + i] = make_result(query, *res)
+
+            # 중간 저장 (배치마다)
+            with open(temp_output_path, 'w', encoding='utf-8') as f:
+                json.dump(output_data, f, indent=2, ensure_ascii=False)
+
+    else:
+        # 병렬 처리
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            futures = [executor.submit(process, (i, item)) for i, item in enumerate(questions)]
+
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Processing"):
+                idx, result = future.result()
+                output_data[idx] = result  # 순서 유지
+
+                # 중간 저장 (10개마다)
+                if idx % 10 == 0:
+                    with open(temp_output_path, 'w', encoding='utf-8') as f:
+                        json.dump(output_data, f, indent=2, ensure_ascii=False)
 
     chunk_log_file.close()
 
@@ -116,6 +138,9 @@ def main(dataset_name: str, input_path_param: str = None, output_path_param: str
     # 통계
     valid_items = [it for it in output_data if it and not it["result"].startswith("[Error]")]
     print(f"Total: {len(output_data)}, Valid: {len(valid_items)}")
+    print("Query embedding cache:", rag.retriever.embedder.query_cache_stats())
+    if rag.retriever.embedder.adaptive_rounds:
+        print("Adaptive over-retrieval:", rag.retriever.embedder.adaptive_stats())
     
     # 파이프라인 상태 업데이트
     state = config.load_pipeline_state() or {}
@@ -137,7 +162,9 @@ if __name__ == "__main__":
     parser.add_argument("--dataset", required=True, help="Dataset name")
     parser.add_argument("--input", help="Input QA JSON file path")
     parser.add_argument("--output", help="Output answers JSON file path")
+    parser.add_argument("--batch-size", type=int, default=SEARCH_BATCH_SIZE,
+                        help="Batch edge search over N questions at a time (0 = per-question search)")
     
     args = parser.parse_args()
-    main(args.dataset, args.input, args.output)
+    main(args.dataset, args.input, args.output, args.batch_size)
 
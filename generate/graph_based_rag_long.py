@@ -67,13 +67,14 @@ class GraphRAG:
             parts.append(f"[Chunk {i}] {text}")
 
         for i, hit in enumerate(edges_meta, 1):
-            source = hit.get("source", "?")
-            label  = hit.get("label", "?")
-            target = hit.get("target", "?")
             sent   = hit.get("sentence", "")
+            triples = "\n".join(
+                f"[{e.get('source', '?')}] --{e.get('label', '?')}→ [{e.get('target', '?')}]"
+                for e in (hit.get("edges") or [hit])
+            )
 
             parts.append(
-                f"[{source}] --{label}→ [{target}]\n{sent}"
+                f"{triples}\n{sent}"
             )
 
         return "\n".join(parts)
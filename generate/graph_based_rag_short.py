@@ -1,5 +1,6 @@
 import os, openai, json, sys, time
 from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -49,6 +50,8 @@ class GraphRAG:
             self.kv_json_path = kv_json_path or str(config.get_kv_store_file())
             self.index_path = index_path or str(config.get_edge_index_file())
             self.payload_path = payload_path or str(config.get_edge_payload_file())
+            # USE_GRAPH_SHARDS: search the topic shards of index/graph_partition.py instead of one index
+            self.shards_dir = str(config.get_graph_shards_dir()) if config.use_graph_shards else None
         else:
             # 기본값 설정 (호환성을 위해)
             self.gexf_path = gexf_path or "hotpotQA/graph_v1.gexf"
@@ -56,6 +59,7 @@ class GraphRAG:
             self.kv_json_path = kv_json_path or "hotpotQA/kv_store_text_chunks.json"
             self.index_path = index_path or "hotpotQA/edge_index_v1.faiss"
             self.payload_path = payload_path or "hotpotQA/edge_payloads_v1.npy"
+            self.shards_dir = None
         
         self.embed_model = embed_model
         self.chat_model = chat_model
@@ -78,6 +82,7 @@ class GraphRAG:
             embedding_model = embed_model,
             openai_api_key  = OPENAI_API_KEY,
             client          = self.client,
+            shards_dir      = self.shards_dir,
         )
 
         self.chat_model = chat_model
@@ -96,17 +101,19 @@ class GraphRAG:
 
         # 2) 전체 edge 정보
         for i, hit in enumerate(edges_meta, 1):
-            source = hit.get("source", "?")
-            label  = hit.get("label", "?")
-            target = hit.get("target", "?")
             # score  = hit.get("score", 0.0)
             # rank   = hit.get("rank", "?")
             sent   = hit.get("sentence", "")
             # cid  = hit.get("chunk_id", "?")  # 필요시 포함 가능
 
+            # 같은 문장을 공유하는 모든 엣지를 나열한 뒤 문장은 한 번만 붙임
+            triples = "\n".join(
+                f"[{e.get('source', '?')}] --{e.get('label', '?')}→ [{e.get('target', '?')}]"
+                for e in (hit.get("edges") or [hit])
+            )
             parts.append(
                 # f"(Edge {i} | rank={rank} score={score:.3f})\n"
-                f"[{source}] --{label}→ [{target}]\n"
+                f"{triples}\n"
                 f"{sent}"
             )
 
@@ -120,6 +127,34 @@ class GraphRAG:
         end_time = time.time()
         spent_time = end_time - start_time
 
+        return self._generate(query, out, spent_time)
+
+    def answer_many(self, queries: List[str], top_k1: int = 50, top_k2: int = 10, max_workers: int = 10) -> List:
+        """
+        여러 질문을 한 번에 처리합니다. 검색은 ``Retriever.retrieve_many``로 묶어서
+        (배치 임베딩 + multi-row FAISS 검색) 하고, 답변 생성만 스레드로 병렬 실행합니다.
+
+        Returns: 질문 순서대로 ``(answer, spent_time, context, chunk_ids)`` 목록.
+                 ``spent_time``은 배치 검색 시간을 질문 수로 나눈 값입니다.
+        """
+        start_time = time.time()
+        outs = self.retriever.retrieve_many(queries, top_k1=top_k1, top_k2=top_k2)
+        spent_time = (time.time() - start_time) / max(len(queries), 1)
+
+        def _one(i):
+            try:
+                res = self._generate(queries[i], outs[i], spent_time)
+            except Exception as e:
+                # process()와 같이 실패한 질문은 chunk 로그를 남기지 않음
+                return (f"[Error] {e}", 0.0, None, [])
+            if not isinstance(res, tuple):      # 검색 결과 없음 → 안내 문구만
+                res = (res, spent_time, None)
+            return (*res, outs[i].get("chunks", []))
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(queries)))) as pool:
+            return list(pool.map(_one, range(len(queries))))
+
+    def _generate(self, query: str, out: Dict, spent_time: float):
         chunk_ids: List[str] = out.get("chunks", [])
         edges_meta: List[Dict] = out.get("edges", [])
 
@@ -170,6 +205,7 @@ class GraphRAG:
 if __name__ == "__main__":
     # 테스트용 예제
     import json, numpy as np, faiss, os
+    from index.payload_store import EdgePayloadStore
     
     # 기본 설정으로 테스트
     config = get_config("hotpotQA")  # 기본 데이터셋
@@ -183,8 +219,8 @@ if __name__ == "__main__":
             kv_data = json.load(f)
         print("📝 kv‑store chunks :", len(kv_data))
     
-    if os.path.exists(payload_path):
-        payload = np.load(payload_path, allow_pickle=True)
+    if EdgePayloadStore.exists(payload_path):
+        payload = EdgePayloadStore(payload_path)
         print("📦 payload entries:", len(payload))
     
     if os.path.exists(index_path):
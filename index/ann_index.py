@@ -0,0 +1,255 @@
+"""
+FAISS index factory for the edge-sentence index.
+
+``EDGE_INDEX_TYPE`` takes any ``faiss.index_factory`` description, e.g.
+
+* ``Flat``            exact inner-product scan (default)
+* ``HNSW32``          graph index, tuned at query time with ``efSearch``
+* ``IVF4096,Flat``    inverted lists, tuned at query time with ``nprobe``
+* ``IVF1024,PQ64``    inverted lists over product-quantised codes
+
+Indexes that need training are trained at build time on a random sample of the
+vectors. Query-time parameters are stored in ``<index>.meta.json`` next to the
+index file and re-applied on every load.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from pathlib import Path
+from typing import Dict, Tuple
+
+import faiss
+import numpy as np
+
+# Query-time knobs understood by faiss.ParameterSpace that we persist
+SEARCH_PARAM_NAMES = ("nprobe", "efSearch")
+
+
+def index_meta_path_for(index_path: str) -> Path:
+    """Small JSON sidecar describing the index (``foo.faiss`` → ``foo.meta.json``)."""
+    return Path(index_path).with_suffix(".meta.json")
+
+
+def read_index(index_path: str, mmap: bool = False) -> Tuple[faiss.Index, bool]:
+    """Read an index, memory-mapping its vector / code storage when *mmap* is set.
+
+    Mapped storage lives in the page cache and is shared by every process that
+    maps the same file, instead of being copied into each process's heap.
+    ``IO_FLAG_MMAP_IFC`` (recent faiss) covers flat, SQ/PQ, HNSW and IVF indexes;
+    older builds only map IVF lists (``IO_FLAG_MMAP``). Returns ``(index, mapped)``;
+    falls back to a normal read when the index type cannot be mapped.
+    """
+    if mmap:
+        for name in ("IO_FLAG_MMAP_IFC", "IO_FLAG_MMAP"):
+            flag = getattr(faiss, name, None)
+            if flag is None:
+                continue
+            try:
+                return faiss.read_index(str(index_path), flag), True
+            except RuntimeError:
+                continue
+    return faiss.read_index(str(index_path)), False
+
+
+def make_index(spec: str, dim: int) -> faiss.Index:
+    """Create an empty inner-product index from a factory string."""
+    return faiss.index_factory(dim, spec, faiss.METRIC_INNER_PRODUCT)
+
+
+def min_training_points(spec: str) -> int:
+    """Smallest number of vectors that can train *spec* (k-means needs ≥ 1 point per centroid)."""
+    need = 0
+    m = re.search(r"IVF(\d+)", spec)
+    if m:
+        need = max(need, int(m.group(1)))
+    m = re.search(r"PQ\d+(?:x(\d+))?", spec)
+    if m:
+        need = max(need, 2 ** int(m.group(1) or 8))
+    return need
+
+
+def train_index(index: faiss.Index, vecs: np.ndarray, spec: str, max_train: int, seed: int = 0) -> None:
+    """Train *index* on at most *max_train* randomly chosen rows of *vecs* (no-op if not needed)."""
+    if index.is_trained:
+        return
+    need = min_training_points(spec)
+    if len(vecs) < need:
+        raise ValueError(
+            f"Index type '{spec}' needs at least {need} vectors to train, got {len(vecs)}. "
+            "Use a smaller nlist / PQ code size or EDGE_INDEX_TYPE=Flat."
+        )
+    if len(vecs) > max_train:
+        rows = np.random.default_rng(seed).choice(len(vecs), size=max(max_train, need), replace=False)
+        vecs = vecs[np.sort(rows)]
+    index.train(np.ascontiguousarray(vecs, dtype="float32"))
+
+
+def build_ann_index(vecs: np.ndarray, spec: str, max_train: int) -> faiss.Index:
+    """Create, train and fill an index of type *spec* with *vecs*."""
+    index = make_index(spec, vecs.shape[1])
+    train_index(index, vecs, spec, max_train)
+    index.add(np.ascontiguousarray(vecs, dtype="float32"))
+    return index
+
+
+def build_ann_index_from_shards(shard_paths, spec: str, max_train: int, seed: int = 0) -> faiss.Index:
+    """Like :func:`build_ann_index` for vectors stored as a sequence of ``.npy`` shards.
+
+    Shards are memory-mapped and added one at a time, and the training sample is
+    gathered row-wise, so besides the index itself only about one shard (or the
+    training sample) is in memory at once. Row ids follow shard order.
+    """
+    shards = [np.load(p, mmap_mode="r") for p in shard_paths]
+    sizes = [len(s) for s in shards]
+    total, dim = sum(sizes), shards[0].shape[1]
+    index = make_index(spec, dim)
+
+    if not index.is_trained:
+        need = min_training_points(spec)
+        if total < need:
+            raise ValueError(
+                f"Index type '{spec}' needs at least {need} vectors to train, got {total}. "
+                "Use a smaller nlist / PQ code size or EDGE_INDEX_TYPE=Flat."
+            )
+        rows = np.arange(total)
+        if total > max_train:
+            rows = np.sort(np.random.default_rng(seed).choice(total, size=max(max_train, need), replace=False))
+        offsets = np.cumsum([0] + sizes)
+        sample = np.concatenate([
+            shards[i][rows[(rows >= offsets[i]) & (rows < offsets[i + 1])] - offsets[i]]
+            for i in range(len(shards))
+        ])
+        train_index(index, sample, spec, max_train, seed)
+        del sample
+
+    for shard in shards:
+        index.add(np.ascontiguousarray(shard, dtype="float32"))
+    return index
+
+
+def apply_search_params(index: faiss.Index, params: Dict[str, int]) -> Dict[str, int]:
+    """Apply the query-time parameters that *index* understands; returns the ones applied."""
+    ps = faiss.ParameterSpace()
+    applied = {}
+    for name, value in params.items():
+        if value is None:
+            continue
+        try:
+            ps.set_index_parameter(index, name, value)
+        except RuntimeError:
+            continue  # e.g. nprobe on an HNSW index
+        applied[name] = value
+    return applied
+
+
+def save_index_meta(index_path: str, meta: Dict) -> None:
+    with open(index_meta_path_for(index_path), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+
+def load_index_meta(index_path: str) -> Dict:
+    path = index_meta_path_for(index_path)
+    if not path.exists():
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def selector_search_params(index: faiss.Index, sel: faiss.IDSelector, search_params: Dict[str, int]):
+    """SearchParameters of the right subclass restricting *index* to the ids in *sel*.
+
+    faiss ignores the index's own ``nprobe`` / ``efSearch`` once explicit
+    parameters are passed, so the persisted values are carried over here.
+    Returns None for indexes whose ``search`` rejects a selector (e.g. raw
+    ``IndexPQ``); callers then have to score the candidate rows themselves.
+    """
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        return faiss.SearchParametersIVF(sel=sel, nprobe=int(search_params.get("nprobe", ivf.nprobe)))
+    base = faiss.downcast_index(index)
+    if isinstance(base, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=sel, efSearch=int(search_params.get("efSearch", base.hnsw.efSearch)))
+    if isinstance(base, (faiss.IndexFlat, faiss.IndexScalarQuantizer)):
+        return faiss.SearchParameters(sel=sel)
+    return None
+
+
+def enable_reconstruct(index: faiss.Index) -> None:
+    """Make ``reconstruct`` / ``reconstruct_batch`` work on IVF indexes (no-op otherwise)."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and ivf.direct_map.type == faiss.DirectMap.NoMap:
+        ivf.make_direct_map()
+
+
+def flat_vectors(index: faiss.Index) -> np.ndarray | None:
+    """Zero-copy ``(ntotal, d)`` view of a flat index's stored vectors, else None."""
+    base = faiss.downcast_index(index)
+    if not isinstance(base, faiss.IndexFlat) or base.ntotal == 0:
+        return None
+    return faiss.rev_swig_ptr(base.get_xb(), base.ntotal * base.d).reshape(base.ntotal, base.d)
+
+
+# ---------------------------------------------------------------------------
+# Quantised vector storage + exact re-ranking
+# ---------------------------------------------------------------------------
+
+# EDGE_VECTOR_STORAGE → faiss code description replacing the "Flat" storage part
+VECTOR_STORAGE_CODES = {"float32": "Flat", "float16": "SQfp16", "int8": "SQ8"}
+
+
+def compose_index_spec(index_type: str, storage: str) -> str:
+    """Swap the vector storage of *index_type* for a quantised one.
+
+    ``("Flat", "int8") → "SQ8"``, ``("IVF1024,Flat", "float16") → "IVF1024,SQfp16"``,
+    ``("HNSW32", "int8") → "HNSW32,SQ8"``. ``storage`` may also be a raw code such
+    as ``PQ64``. Specs that already name a non-flat storage are returned unchanged.
+
+    ``("Flat", "PQ64")`` gives a plain ``IndexPQ``, which :func:`selector_search_params`
+    cannot restrict; filtered search then re-scores the candidate rows from the
+    exact float32 copy written next to every quantised index.
+    """
+    code = VECTOR_STORAGE_CODES.get(storage, storage)
+    if not storage or code == "Flat":
+        return index_type
+    parts = [p.strip() for p in index_type.split(",")]
+    if parts[-1] == "Flat":
+        parts[-1] = code
+    elif len(parts) == 1 and parts[0].startswith("HNSW"):
+        parts.append(code)
+    else:
+        return index_type
+    return ",".join(parts)
+
+
+def exact_vectors_path_for(index_path: str) -> Path:
+    """Raw float32 copy of the index vectors used for re-ranking (``foo.faiss`` → ``foo.vectors.f32``)."""
+    return Path(index_path).with_suffix(".vectors.f32")
+
+
+def append_exact_vectors(index_path: str, vecs: np.ndarray, reset: bool = False) -> None:
+    with open(exact_vectors_path_for(index_path), "wb" if reset else "ab") as f:
+        f.write(np.ascontiguousarray(vecs, dtype="float32").tobytes())
+
+
+def open_exact_vectors(index_path: str, dim: int) -> np.memmap | None:
+    path = exact_vectors_path_for(index_path)
+    if not path.exists() or path.stat().st_size == 0:
+        return None
+    return np.memmap(path, dtype="float32", mode="r", shape=(path.stat().st_size // (4 * dim), dim))
+
+
+def rerank_exact(q_vec: np.ndarray, I: np.ndarray, vectors: np.ndarray, k: int):
+    """Re-score each row of candidate ids *I* with exact float32 dot products, keep the best *k*."""
+    D_out = np.full((len(I), k), -np.inf, dtype="float32")
+    I_out = np.full((len(I), k), -1, dtype=np.int64)
+    for qi, ids in enumerate(I):
+        ids = np.sort(ids[ids >= 0])     # sorted rows → sequential reads from the memmap
+        if len(ids) == 0:
+            continue
+        scores = vectors[ids] @ q_vec[qi]
+        order = np.argsort(-scores, kind="stable")[:k]
+        D_out[qi, :len(order)] = scores[order]
+        I_out[qi, :len(order)] = ids[order]
+    return D_out, I_out
@@ -1,11 +1,16 @@
 import os
 import json
 import sys
+import hashlib
+import shutil
+import threading
 from pathlib import Path
 import networkx as nx
 import numpy as np
 import faiss
-from typing import List, Tuple, Dict, Set
+from collections import Counter
+from functools import lru_cache
+from typing import Iterator, List, Tuple, Dict, Set
 from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
 from openai import OpenAI
@@ -18,13 +23,49 @@ sys.path.insert(0, str(PROJECT_ROOT))
 
 # Import configuration
 from config import get_config
+from index.embedding_cache import EmbeddingCache, QueryEmbeddingCache, cached_dims
+from index.embedding_backend import make_embedding_client, model_identity
+from index.graph_snapshot import CSRGraph, load_graph
+from index.payload_store import EdgePayloadStore, payload_dir_for, write_payload_store
+from index.ann_index import (
+    append_exact_vectors,
+    apply_search_params,
+    build_ann_index_from_shards,
+    compose_index_spec,
+    enable_reconstruct,
+    exact_vectors_path_for,
+    flat_vectors,
+    load_index_meta,
+    open_exact_vectors,
+    read_index,
+    rerank_exact,
+    save_index_meta,
+    selector_search_params,
+)
 
 # Load configuration
 config = get_config()
 
 # Embedding model configuration
 EMBEDDING_MODEL = config.embed_model
+EMBED_BACKEND = config.embed_backend
 MAX_WORKERS = config.max_workers
+EMBED_BATCH_SIZE = config.embed_batch_size
+EMBED_BATCH_MAX_TOKENS = config.embed_batch_max_tokens
+EMBED_CACHE_DIR = config.embed_cache_dir if config.enable_cache else None
+QUERY_CACHE_SIZE = config.query_cache_size
+QUERY_CACHE_DIR = config.query_cache_dir
+EDGE_INDEX_TYPE = config.edge_index_type
+EDGE_INDEX_TRAIN_SIZE = config.edge_index_train_size
+EDGE_BUILD_SHARD_SIZE = config.edge_build_shard_size
+EDGE_VECTOR_STORAGE = config.edge_vector_storage
+EDGE_RERANK_FACTOR = config.edge_rerank_factor
+EDGE_INDEX_MMAP = config.edge_index_mmap
+EDGE_SEARCH_PARAMS = {"nprobe": config.edge_index_nprobe, "efSearch": config.edge_index_ef_search}
+FILTER_MODE = config.filter_mode
+ADAPTIVE_START_FACTOR = config.adaptive_start_factor
+ADAPTIVE_GROWTH = config.adaptive_growth
+FILTER_EXACT_MAX_ROWS = config.filter_exact_max_rows
 
 # Load environment variables
 load_dotenv()
@@ -42,6 +83,63 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
 import re
 
+
+@lru_cache(maxsize=1)
+def _token_encoder():
+    """Return the tiktoken encoder used by text-embedding-3, or None if unavailable."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Token count of *text*; falls back to the UTF-8 byte length (an upper bound)."""
+    enc = _token_encoder()
+    if enc is None:
+        return len(text.encode("utf-8"))
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def iter_embedding_batches(
+    texts: List[str],
+    max_items: int = EMBED_BATCH_SIZE,
+    max_tokens: int | None = EMBED_BATCH_MAX_TOKENS,
+) -> Iterator[List[int]]:
+    """Yield lists of positions into *texts*, each bounded by item count and token budget.
+
+    A single text longer than ``max_tokens`` still gets its own batch so that the
+    provider (not this helper) decides whether it is too long. ``max_tokens=None``
+    bounds batches by item count only (local models truncate on their own).
+    """
+    batch: List[int] = []
+    batch_tokens = 0
+    for pos, text in enumerate(texts):
+        if max_tokens is None:
+            if len(batch) >= max_items:
+                yield batch
+                batch = []
+            batch.append(pos)
+            continue
+        n_tok = count_tokens(text)
+        if batch and (len(batch) >= max_items or batch_tokens + n_tok > max_tokens):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(pos)
+        batch_tokens += n_tok
+    if batch:
+        yield batch
+
+
+def normalize_rows(mat: np.ndarray) -> np.ndarray:
+    """L2-normalise every row of *mat* in place (zero rows are left untouched)."""
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    mat /= norms
+    return mat
+
+
 def build_sent2chunk(graph_json_path: str) -> Dict[str, int]:
     with open(graph_json_path, encoding="utf-8") as f:
         data = json.load(f)
@@ -73,6 +171,44 @@ def build_sent2chunk(graph_json_path: str) -> Dict[str, int]:
 
     return mapping
 
+def edge_key(src: str, dst: str, label: str, sentence: str) -> str:
+    """Stable content id of one (source, target, label, sentence) edge entry."""
+    raw = "\x1f".join((src, dst, label or "", sentence))
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=10).hexdigest()
+
+
+def manifest_path_for(index_path: str) -> Path:
+    """Edge-id manifest stored next to the FAISS index (``foo.faiss`` → ``foo.manifest.json``)."""
+    return Path(index_path).with_suffix(".manifest.json")
+
+
+def build_dir_for(index_path: str) -> Path:
+    """Shard directory of an in-progress build (``foo.faiss`` → ``foo.build/``)."""
+    return Path(index_path).with_suffix(".build")
+
+
+def sentences_digest(sentences: List[str]) -> str:
+    """Fingerprint of the ordered sentence list a build embeds (shards are only valid for it)."""
+    h = hashlib.blake2b(digest_size=16)
+    for s in sentences:
+        h.update(s.encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+def _upgrade_legacy_payload(p: Dict) -> Dict:
+    """Wrap a pre-dedup (one edge per row) payload in the ``edges`` fan-out format."""
+    return {
+        "sentence": p.get("sentence"),
+        "chunk_id": p.get("chunk_id"),
+        "edges": [{
+            "edge_id": p.get("edge_id"),
+            "source": p.get("source"),
+            "target": p.get("target"),
+            "label": p.get("label"),
+        }],
+    }
+
 class EdgeEmbedderFAISS:
 
 
@@ -84,86 +220,501 @@ class EdgeEmbedderFAISS:
         index_path: str,
         payload_path: str,
         json_path: str,
+        client: OpenAI | None = None,
+        cache_dir: str | None = EMBED_CACHE_DIR,
+        index_type: str = EDGE_INDEX_TYPE,
+        vector_storage: str = EDGE_VECTOR_STORAGE,
+        backend: str = EMBED_BACKEND,
+        graph: nx.Graph | None = None,
+        sent2cid: Dict[str, int] | None = None,
     ) -> None:
-        # Load graph and initialize
-        self.graph = nx.read_gexf(gexf_path)
+        # The graph, the edge list and sent2cid are only needed to build / update
+        # the index and are loaded on first use; pass *graph* / *sent2cid* to reuse loaded ones.
+        self.gexf_path = gexf_path
+        self._graph = graph
+        self._edges: List[Edge] | None = None
+        self._sent2cid = sent2cid
         self.embedding_model = embedding_model
+        # openai | local | stub; recorded in the manifest together with the model
+        self.backend = backend
+        self.model_id = model_identity(backend, embedding_model)
         # self.openai = OpenAI(api_key=openai_api_key, base_url="https://generativelanguage.googleapis.com/v1beta/openai/")
-        self.openai = OpenAI(api_key=openai_api_key)
+        # Any object exposing ``embeddings.create`` works here (see index/embedding_backend.py).
+        self.openai = client or make_embedding_client(backend, embedding_model, openai_api_key)
+        self.batch_size = getattr(self.openai, "max_batch_items", EMBED_BATCH_SIZE)
+        self.batch_max_tokens = getattr(self.openai, "max_batch_tokens", EMBED_BATCH_MAX_TOKENS)
+        self.request_workers = getattr(self.openai, "max_concurrency", MAX_WORKERS)
+        self.cache_dir = cache_dir
+        self.index_type = compose_index_spec(index_type, vector_storage)
+        self.search_params: Dict[str, int] = {}
+        self.rerank_factor = EDGE_RERANK_FACTOR
+        self.exact_vectors: np.ndarray | None = None   # float32 memmap kept for quantised indexes
+        self._cache: EmbeddingCache | None = None
+        self._query_cache: QueryEmbeddingCache | None = None
+        self._query_cache_lock = threading.Lock()
+        self.adaptive_rounds: Counter = Counter()   # rounds → number of adaptive searches
+        self._stats_lock = threading.Lock()
+        self._dim: int | None = None
         self.index_path = index_path
         self.payload_path = payload_path
+        self.payload_dir = payload_dir_for(payload_path)
         self.json_path = json_path
 
-        # Prepare edges: split by sentence and assign unique ids
-        self.edges: List[Edge] = []
-        for src, dst, data in self.graph.edges(data=True):
-            label = data.get("label") or data.get("relation_type", "")
-            sentence_block = data.get("sentence", "")
-            if sentence_block:
-                sentences = [s.strip() for s in sentence_block.split("/") if s.strip()]
+        # Placeholders for index and payload
+        self.index: faiss.Index
+        # list of dicts while building, memory-mapped EdgePayloadStore once saved/loaded
+        self.payloads: List[Dict] | EdgePayloadStore = []
+        self.tombstones: Set[int] = set()   # rows whose sentence left the graph
+        self.index_mmapped = False          # index storage mapped read-only from disk
+
+    @property
+    def graph(self) -> nx.Graph:
+        if self._graph is None:
+            self._graph = load_graph(self.gexf_path)
+        return self._graph
+
+    @property
+    def edges(self) -> List[Edge]:
+        """Every (id, source, target, label, sentence) edge entry of the graph."""
+        if self._edges is None:
+            # Prepare edges: one entry per sentence, with unique ids
+            edges: List[Edge] = []
+            structured = isinstance(self.graph, CSRGraph) and self.graph.edge_attr_kind("sentence") == "strlist"
+            for row, (src, dst, data) in enumerate(self.graph.edges(data=True)):
+                label = data.get("label") or data.get("relation_type", "")
+                if structured:
+                    # snapshot keeps the sentences of a merged edge as a list – no re-splitting
+                    sentences = [s.strip() for s in self.graph.edge_values(row, "sentence") or [] if s.strip()]
+                else:
+                    # a graph read from the GEXF only has the " / "-joined string
+                    sentence_block = data.get("sentence", "")
+                    sentences = [s.strip() for s in sentence_block.split("/") if s.strip()] if sentence_block else []
                 for i, sentence in enumerate(sentences):
                     eid = f"{src}-{dst}-{label}".replace(" ", "_") + f"#{i}"
-                    self.edges.append((eid, src, dst, label, sentence))
+                    edges.append((eid, src, dst, label, sentence))
+            self._edges = edges
+        return self._edges
 
-        # Placeholders for index and payload
-        self.index: faiss.IndexFlatIP
-        self.payloads: List[Dict] = []
-        self.sent2cid = build_sent2chunk(self.json_path)
+    @property
+    def sent2cid(self) -> Dict[str, int]:
+        if self._sent2cid is None:
+            self._sent2cid = build_sent2chunk(self.json_path)
+        return self._sent2cid
 
 
-    def _embed(self, text: str) -> np.ndarray:
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        """Embed *texts* with a single API call; returns L2-normalised rows in input order."""
         resp = self.openai.embeddings.create(
-            input=[text], model=self.embedding_model
+            input=texts, model=self.embedding_model
         )
-        emb = np.array(resp.data[0].embedding, dtype="float32")
-        return emb / np.linalg.norm(emb)
+        # The API tags each item with its input position – never trust response order.
+        data = sorted(resp.data, key=lambda d: d.index)
+        mat = np.asarray([d.embedding for d in data], dtype="float32")
+        return normalize_rows(mat)
+
+    def _embed(self, text: str) -> np.ndarray:
+        return self._embed_batch([text])[0]
+
+    def embedding_dim(self) -> int:
+        """Dimension of the embedding model.
+
+        Taken from the loaded index, the manifest of an index built with this
+        model, or this model's embedding cache; only when none of them exists
+        is the API probed (once) with a single request.
+        """
+        if self._dim is None:
+            self._dim = self._known_dim() or int(self._embed("test").shape[0])
+        return self._dim
+
+    def _known_dim(self) -> int | None:
+        index = getattr(self, "index", None)
+        if index is not None:
+            return int(index.d)
+        manifest = self.load_manifest()
+        if manifest and manifest.get("dim") and model_identity(
+            manifest.get("embedding_backend", "openai"), manifest.get("embedding_model")
+        ) == self.model_id:
+            return int(manifest["dim"])
+        if self.cache_dir is not None:
+            dims = cached_dims(self.cache_dir, self.model_id)
+            if len(dims) == 1:   # several dims of one model: can't tell which – probe
+                return dims[0]
+        return None
+
+    def embedding_cache(self) -> EmbeddingCache | None:
+        """Persistent sentence cache for this model, or None when caching is disabled."""
+        if self.cache_dir is None:
+            return None
+        if self._cache is None:
+            self._cache = EmbeddingCache(self.cache_dir, self.model_id, self.embedding_dim())
+        return self._cache
+
+    def embed_texts(self, texts: List[str], desc: str = "Embedding") -> np.ndarray:
+        """Embed many texts using token/count-bounded batches sent in parallel.
+
+        Texts already in the persistent embedding cache are not sent to the API;
+        freshly embedded batches are appended to the cache as they arrive.
+        Row ``i`` of the returned matrix always belongs to ``texts[i]``.
+        """
+        out = np.empty((len(texts), self.embedding_dim()), dtype="float32")
+        cache = self.embedding_cache()
+        if cache is not None:
+            hit = cache.lookup(texts, out)
+            todo = np.flatnonzero(~hit)
+            print(f"💾 embedding cache: {int(hit.sum())} hits, {len(todo)} misses")
+        else:
+            todo = np.arange(len(texts))
+
+        miss_texts = [texts[i] for i in todo]
+        batches = iter_embedding_batches(miss_texts, self.batch_size, self.batch_max_tokens)
+
+        def worker(batch: List[int]):
+            return batch, self._embed_batch([miss_texts[i] for i in batch])
+
+        with ThreadPoolExecutor(max_workers=self.request_workers) as executor, \
+                tqdm(total=len(texts), initial=len(texts) - len(todo), desc=desc) as bar:
+            for batch, mat in executor.map(worker, batches):
+                out[todo[batch]] = mat
+                if cache is not None:
+                    cache.add([miss_texts[i] for i in batch], mat)
+                bar.update(len(batch))
+        return out
+
+    def group_edges_by_sentence(self) -> Dict[str, List[Edge]]:
+        """Map each unique edge sentence to every edge that carries it (first-seen order)."""
+        groups: Dict[str, List[Edge]] = {}
+        for edge in self.edges:
+            groups.setdefault(edge[4], []).append(edge)
+        return groups
 
     def build_index(self) -> None:
-        # Determine embedding dimension
-        dim = self._embed("test").shape[0]
-        self.index = faiss.IndexFlatIP(dim)
+        if not self.edges:
+            raise ValueError("Graph contains no edge sentences to embed.")
 
-        
-        seen: set[str] = set()           # ✅ 이미 임베딩한 문장 저장
-        vecs, payloads = [], []
-
-        # Worker function to embed and generate payload
-        def worker(edge: Edge):
-            eid, src, dst, lbl, sent = edge
-            key = sent
-            if key in seen:
-                return None
-            emb = self._embed(sent)
-            cid = self.sent2cid.get(key)
-            payload = {
-            "edge_id": eid,
-            "source": src,
-            "target": dst,
-            "label": lbl,
-            "sentence": sent,
-            "chunk_id": cid,  # ✅ 추가됨
-            }
-            return emb, payload
+        # One vector per unique sentence; every edge sharing it goes into that row's payload
+        groups = self.group_edges_by_sentence()
+        sentences = list(groups)
+        print(f"🔁 {len(self.edges)} edge sentences → {len(sentences)} unique")
 
-        # Embed all edge sentences in parallel
-        results = []
-        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-            for res in tqdm(executor.map(worker, self.edges), total=len(self.edges), desc="Embedding edges"):
-                if res is None:
-                    continue
-                emb, payload = res
-                vecs.append(emb)
-                payloads.append(payload)
+        # row i ↔ sentences[i]; vectors are streamed to on-disk shards
+        shard_paths = self.embed_to_shards(sentences)
+
+        payloads = []
+        for sent in sentences:
+            payloads.append({
+            "sentence": sent,
+            "chunk_id": self.sent2cid.get(sent),  # ✅ 추가됨
+            "edges": [self._payload_edge(e) for e in groups[sent]],
+            })
 
+        print(f"🧭 building '{self.index_type}' index over {len(sentences)} vectors from {len(shard_paths)} shard(s)")
+        self.index = build_ann_index_from_shards(shard_paths, self.index_type, EDGE_INDEX_TRAIN_SIZE)
+        self.search_params = apply_search_params(self.index, EDGE_SEARCH_PARAMS)
+        if self.is_quantized():
+            # Full-precision copy on disk only; read back through a memmap for re-ranking
+            for i, path in enumerate(shard_paths):
+                append_exact_vectors(self.index_path, np.load(path, mmap_mode="r"), reset=(i == 0))
+        else:
+            exact_vectors_path_for(self.index_path).unlink(missing_ok=True)
         self.payloads = payloads
-        self.index.add(np.vstack(vecs))
+        self.tombstones = set()
+
+        self.save_index()
+        shutil.rmtree(build_dir_for(self.index_path), ignore_errors=True)
+
+    def embed_to_shards(self, sentences: List[str], shard_size: int = None) -> List[Path]:
+        """Embed *sentences* into ``<index>.build/shard_NNNNN.npy`` files, resuming a previous run.
+
+        ``progress.json`` records the model, the sentence-list digest and the
+        shards already written. A shard file only appears (atomic rename) once
+        all its vectors are on disk, so after a crash or rate-limit abort the
+        next run skips every completed shard. Progress from a different model or
+        a different sentence list is discarded.
+        """
+        shard_size = shard_size or EDGE_BUILD_SHARD_SIZE
+        build_dir = build_dir_for(self.index_path)
+        progress_path = build_dir / "progress.json"
+        progress = {
+            "model": self.model_id,
+            "sentences": sentences_digest(sentences),
+            "num_sentences": len(sentences),
+            "shard_size": shard_size,
+            "done": [],
+        }
+        if progress_path.exists():
+            with open(progress_path, encoding="utf-8") as f:
+                old = json.load(f)
+            if all(old.get(k) == progress[k] for k in ("model", "sentences", "shard_size")):
+                progress["done"] = old.get("done", [])
+            else:
+                print(f"🧹 discarding stale build shards in {build_dir}")
+                shutil.rmtree(build_dir)
+        build_dir.mkdir(parents=True, exist_ok=True)
+
+        n_shards = max(1, -(-len(sentences) // shard_size))
+        done = set(progress["done"])
+        if done:
+            print(f"⏩ resuming build: {len(done)}/{n_shards} shards already embedded")
+
+        paths = []
+        for i in range(n_shards):
+            path = build_dir / f"shard_{i:05d}.npy"
+            paths.append(path)
+            if i in done and path.exists():
+                continue
+            vecs = self.embed_texts(
+                sentences[i * shard_size:(i + 1) * shard_size],
+                desc=f"Embedding edges [{i + 1}/{n_shards}]",
+            )
+            tmp = build_dir / f"shard_{i:05d}.tmp.npy"
+            np.save(tmp, vecs)
+            os.replace(tmp, path)
+            done.add(i)
+            progress["done"] = sorted(done)
+            with open(progress_path, "w", encoding="utf-8") as f:
+                json.dump(progress, f)
+            del vecs
+        return paths
+
+    def is_quantized(self) -> bool:
+        """True when the index stores compressed (SQ/PQ) codes instead of float32 vectors."""
+        return "SQ" in self.index_type or "PQ" in self.index_type
+
+    def _payload_edge(self, edge: Edge) -> Dict:
+        eid, src, dst, lbl, _sent = edge
+        return {"edge_id": eid, "source": src, "target": dst, "label": lbl}
+
+    def current_edge_keys(self) -> Set[str]:
+        return {edge_key(src, dst, lbl, sent) for _eid, src, dst, lbl, sent in self.edges}
+
+    def save_index(self) -> None:
+        """Write the FAISS index, the payload store and the edge-id manifest, then reopen the store."""
+        # Write-then-rename: processes that mmap the old file keep a consistent copy
+        tmp_path = f"{self.index_path}.tmp"
+        faiss.write_index(self.index, tmp_path)
+        os.replace(tmp_path, self.index_path)
+        write_payload_store(self.payload_dir, self.payloads)
+
+        manifest = {
+            "version": 1,
+            "embedding_model": self.embedding_model,
+            "embedding_backend": self.backend,
+            "dim": int(self.index.d),
+            "num_rows": int(self.index.ntotal),
+            "tombstones": sorted(self.tombstones),
+            "edge_keys": sorted(self.current_edge_keys()),
+        }
+        with open(manifest_path_for(self.index_path), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        self.save_meta()
+        self._open_payloads()
+
+    def save_meta(self) -> None:
+        save_index_meta(self.index_path, {
+            "index_type": self.index_type,
+            "dim": int(self.index.d),
+            "num_rows": int(self.index.ntotal),
+            "search_params": self.search_params,
+            "rerank_factor": self.rerank_factor,
+        })
+
+    def set_search_params(self, persist: bool = True, **params: int) -> Dict[str, int]:
+        """Change query-time parameters (``nprobe``, ``efSearch``, ``rerank``) of the loaded index.
+
+        ``rerank`` is the shortlist multiplier for exact float32 re-ranking of a
+        quantised index (0 disables it). With *persist* the new values are written
+        to the index meta file so that every later :meth:`load_index` uses them.
+        """
+        applied = {}
+        if "rerank" in params:
+            self.rerank_factor = applied["rerank"] = int(params.pop("rerank"))
+        applied.update(apply_search_params(self.index, params))
+        self.search_params.update(applied)
+        if persist:
+            self.save_meta()
+        return applied
+
+    def load_manifest(self) -> Dict | None:
+        path = manifest_path_for(self.index_path)
+        if not path.exists():
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def check_model_identity(self, manifest: Dict | None) -> None:
+        """Refuse to query / extend an index whose vectors came from another model."""
+        if not manifest:
+            return
+        built = model_identity(manifest.get("embedding_backend", "openai"), manifest.get("embedding_model"))
+        if built != self.model_id:
+            raise ValueError(
+                f"Index {self.index_path} was built with '{built}', but the embedder uses "
+                f"'{self.model_id}'. Set EMBED_BACKEND / EMBED_MODEL to match or rebuild with --rebuild."
+            )
+
+    def update_index(self) -> Dict[str, int]:
+        """Incrementally bring an existing index in line with the current graph.
+
+        Only sentences that are not in the index yet are embedded and appended.
+        Rows whose sentence no longer occurs in the graph are tombstoned (their
+        edge list is emptied, the vector stays so row ids remain stable); a
+        tombstoned sentence that reappears is revived without re-embedding.
+        Falls back to :meth:`build_index` when no index exists yet.
+        """
+        if not os.path.exists(self.index_path) or not self.has_payloads():
+            self.build_index()
+            n = int(self.index.ntotal)
+            return {"added_edges": len(self.edges), "removed_edges": 0,
+                    "new_rows": n, "tombstoned_rows": 0, "revived_rows": 0}
+
+        self.load_index(mmap=False)   # appending needs a heap-resident index
+        manifest = self.load_manifest()
+
+        old_keys = set(manifest["edge_keys"]) if manifest else {
+            edge_key(e["source"], e["target"], e.get("label"), p["sentence"])
+            for p in self.payloads for e in p["edges"]
+        }
+        new_keys = self.current_edge_keys()
+        stats = {
+            "added_edges": len(new_keys - old_keys),
+            "removed_edges": len(old_keys - new_keys),
+            "new_rows": 0, "tombstoned_rows": 0, "revived_rows": 0,
+        }
+        if old_keys == new_keys:
+            print("✅ Edge set unchanged – nothing to update.")
+            return stats
+
+        groups = self.group_edges_by_sentence()
+        self.payloads = self.payloads.to_list()   # mutable copy for the update
+        sent2row = {p["sentence"]: row for row, p in enumerate(self.payloads)}
+
+        # Refresh payloads of existing rows; tombstone rows whose sentence is gone
+        for row, p in enumerate(self.payloads):
+            edges = groups.get(p["sentence"])
+            if edges is None:
+                if row not in self.tombstones:
+                    stats["tombstoned_rows"] += 1
+                    self.tombstones.add(row)
+                p["edges"] = []
+                continue
+            if row in self.tombstones:
+                stats["revived_rows"] += 1
+                self.tombstones.discard(row)
+            p["edges"] = [self._payload_edge(e) for e in edges]
+            p["chunk_id"] = self.sent2cid.get(p["sentence"], p.get("chunk_id"))
+
+        # Embed and append sentences the index has never seen
+        new_sentences = [s for s in groups if s not in sent2row]
+        if new_sentences:
+            vecs = self.embed_texts(new_sentences, desc="Embedding new edges")
+            self.index.add(vecs)
+            if self.exact_vectors is not None or self.is_quantized():
+                append_exact_vectors(self.index_path, vecs)
+            for sent in new_sentences:
+                self.payloads.append({
+                    "sentence": sent,
+                    "chunk_id": self.sent2cid.get(sent),
+                    "edges": [self._payload_edge(e) for e in groups[sent]],
+                })
+        stats["new_rows"] = len(new_sentences)
+
+        self.save_index()
+        return stats
+
+    def load_index(self, mmap: bool | None = None) -> None:
+        """Load index, payloads and tombstones for searching.
+
+        With *mmap* (default ``EDGE_INDEX_MMAP``) the index storage is mapped
+        read-only instead of copied into the heap; payloads and exact vectors
+        are always mapped. A mapped index must not be modified (``update_index``
+        reloads it unmapped).
+        """
+        if mmap is None:
+            mmap = EDGE_INDEX_MMAP
+        self.index, self.index_mmapped = read_index(self.index_path, mmap=mmap)
+        meta = load_index_meta(self.index_path)
+        self.index_type = meta.get("index_type", "Flat")
+        self.search_params = apply_search_params(self.index, meta.get("search_params", {}))
+        self.rerank_factor = meta.get("rerank_factor", EDGE_RERANK_FACTOR)
+        if not EdgePayloadStore.exists(self.payload_dir):
+            self._migrate_legacy_payloads()
+        self._open_payloads()
+        manifest = self.load_manifest()
+        self.check_model_identity(manifest)
+        self.tombstones = set(manifest.get("tombstones", [])) if manifest else set()
+
+    def _open_payloads(self) -> None:
+        self.payloads = EdgePayloadStore(self.payload_dir)
+        self.exact_vectors = open_exact_vectors(self.index_path, self.index.d)
+        enable_reconstruct(self.index)
+
+    def _legacy_payload_file(self) -> Path:
+        return Path(str(self.payload_dir) + ".npy")
+
+    def has_payloads(self) -> bool:
+        return EdgePayloadStore.exists(self.payload_dir) or self._legacy_payload_file().is_file()
+
+    def _migrate_legacy_payloads(self) -> None:
+        """Convert a pickled ``.npy`` payload list into the columnar store (once)."""
+        legacy_path = self._legacy_payload_file()
+        if not legacy_path.is_file():
+            raise FileNotFoundError(f"No payload store at {self.payload_dir}")
+        print(f"🔄 converting legacy payloads {legacy_path} → {self.payload_dir}")
+        legacy = np.load(legacy_path, allow_pickle=True).tolist()
+        write_payload_store(
+            self.payload_dir,
+            (p if "edges" in p else _upgrade_legacy_payload(p) for p in legacy),
+        )
+
+    def candidate_rows(self, entities: Set[str]) -> np.ndarray:
+        """Sorted unique rows having at least one edge that touches *entities*."""
+        return self.payloads.candidate_rows(entities)
+
+    def _row_vectors(self, rows: np.ndarray) -> np.ndarray:
+        if self.exact_vectors is not None:
+            return self.exact_vectors[rows]
+        xb = flat_vectors(self.index)
+        if xb is not None:
+            return xb[rows]
+        return self.index.reconstruct_batch(rows)
+
+    def _ann_search(self, q_vec: np.ndarray, k: int, params=None) -> Tuple[np.ndarray, np.ndarray]:
+        """``index.search`` plus optional exact float32 re-ranking of a quantised index."""
+        k = min(k, self.index.ntotal)
+        if self.rerank_factor > 0 and self.exact_vectors is not None:
+            _D, I = self.index.search(q_vec, min(k * self.rerank_factor, self.index.ntotal), params=params)
+            return rerank_exact(q_vec, I, self.exact_vectors, k)
+        return self.index.search(q_vec, k, params=params)
+
+    def _filtered_search(self, q_vec: np.ndarray, k: int, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-*k* among *rows* only: exact matmul for small sets, IDSelector otherwise.
 
-        faiss.write_index(self.index, self.index_path)
-        np.save(self.payload_path, np.array(self.payloads, dtype=object))
+        Indexes that cannot take an IDSelector (raw PQ codes) always use the exact path.
+        """
+        k = min(k, len(rows))
+        sel = faiss.IDSelectorBatch(rows) if len(rows) > FILTER_EXACT_MAX_ROWS else None
+        params = selector_search_params(self.index, sel, self.search_params) if sel is not None else None
+        if params is None:
+            scores = self._row_vectors(rows) @ q_vec[0]
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            return scores[top][None, :], rows[top][None, :]
+
+        D, I = self._ann_search(q_vec, k, params=params)
+        if (I[0] >= 0).sum() < k:
+            # Approximate indexes (low nprobe / efSearch) can miss filtered rows; fall back to exact
+            scores = self._row_vectors(rows) @ q_vec[0]
+            top = np.argsort(-scores, kind="stable")[:k]
+            return scores[top][None, :], rows[top][None, :]
+        return D, I
 
-    def load_index(self) -> None:
-        self.index = faiss.read_index(self.index_path)
-        self.payloads = np.load(self.payload_path, allow_pickle=True).tolist()
+    def _search_k(self, top_k: int, overretrieve: int, filtered: bool) -> int:
+        """Neighbours to fetch before filtering (shared by ``search`` and ``search_vectors``).
+
+        필터 O → ``top_k * overretrieve``, 필터 X → ``top_k``; plus the tombstoned row
+        count either way, since deleted rows still come back from the index.
+        """
+        return (top_k * overretrieve if filtered else top_k) + len(self.tombstones)
 
     def search(
         self,
@@ -171,15 +722,27 @@ class EdgeEmbedderFAISS:
         top_k: int = None,
         filter_entities: Set[str] | None = None,
         overretrieve: int = None,
+        query_vec: np.ndarray | None = None,
     ) -> List[Dict]:
         """
         쿼리에 맞는 관련 엣지를 검색합니다.
         
+        결과 하나는 고유 문장 하나에 대응하며, ``edges``에 그 문장을 공유하는
+        모든 (source, target, label) 엣지가 담깁니다. ``source``/``target``/``label``
+        필드는 그 중 첫 번째 엣지 값입니다.
+
+        필터가 있으면 기본(``FILTER_MODE=native``)으로 entity → row 역색인에서 후보 행을
+        구한 뒤 후보 안에서만 검색하므로, 후보가 충분하면 항상 ``top_k``개를 채웁니다.
+        ``FILTER_MODE=overretrieve``는 예전 방식(많이 뽑은 뒤 버리기)입니다.
+        ``FILTER_MODE=adaptive``는 적게 뽑아 보고 ``top_k``개가 안 차면 k를 배수로 늘려
+        다시 검색합니다 (라운드 수는 ``adaptive_stats()``).
+
         Args:
             query: 검색 쿼리
             top_k: 최종으로 돌려줄 결과 수 (기본값: config.embedding_top_k)
             filter_entities: 필터링할 엔티티 집합 (None이면 필터링 안함)
-            overretrieve: 필터용 여유 검색 개수 (기본값: config.overretrieve_factor)
+            overretrieve: overretrieve 모드에서의 여유 검색 배수 (기본값: config.overretrieve_factor)
+            query_vec: 이미 임베딩한 쿼리 벡터 (주면 임베딩 API를 다시 부르지 않음)
         """
         # 기본값 설정
         if top_k is None:
@@ -188,34 +751,202 @@ class EdgeEmbedderFAISS:
             overretrieve = config.overretrieve_factor
             
         # 1️⃣ 쿼리 임베딩
-        q_vec = self._embed(query).reshape(1, -1)
+        q_vec = (self.embed_query(query) if query_vec is None else np.asarray(query_vec, dtype="float32")).reshape(1, -1)
 
-        # 2️⃣ FAISS 검색 (필터 O → 더 많이, 필터 X → 정확히 top_k)
-        k = top_k * overretrieve if filter_entities else top_k
-        D, I = self.index.search(q_vec, k)
+        # 2️⃣ FAISS 검색
+        if filter_entities and FILTER_MODE == "native":
+            rows = self.candidate_rows(filter_entities)
+            if len(rows) == 0:
+                return []
+            D, I = self._filtered_search(q_vec, top_k, rows)
+        elif filter_entities and FILTER_MODE == "adaptive":
+            return self._adaptive_search(q_vec, top_k, [filter_entities])[0]
+        else:
+            D, I = self._ann_search(q_vec, self._search_k(top_k, overretrieve, bool(filter_entities)))
 
         # 3️⃣ 결과 후처리 (필터 적용 + top_k 슬라이스)
+        return self._collect_results(D[0], I[0], top_k, filter_entities)
+
+    def query_cache(self) -> QueryEmbeddingCache | None:
+        """LRU of query vectors (QUERY_CACHE_SIZE / QUERY_CACHE_DIR), or None when disabled."""
+        if QUERY_CACHE_SIZE <= 0:
+            return None
+        with self._query_cache_lock:
+            if self._query_cache is None:
+                self._query_cache = QueryEmbeddingCache(
+                    self.model_id, self.embedding_dim(), QUERY_CACHE_SIZE, QUERY_CACHE_DIR,
+                )
+            return self._query_cache
+
+    def query_cache_stats(self) -> Dict[str, int]:
+        cache = self._query_cache
+        return cache.stats() if cache is not None else {"hits": 0, "misses": 0, "size": 0, "maxsize": 0}
+
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """Embed queries with as few API calls as the batch limits allow.
+
+        Queries seen before are served from the query LRU and not sent at all.
+        """
+        cache = self.query_cache()
+        if cache is None:
+            out = np.empty((len(queries), self.embedding_dim()), dtype="float32")
+            todo = np.arange(len(queries))
+        else:
+            out = np.empty((len(queries), cache.dim), dtype="float32")
+            todo = np.flatnonzero(~cache.lookup(queries, out))
+
+        miss = [queries[i] for i in todo]
+        for batch in iter_embedding_batches(miss, self.batch_size, self.batch_max_tokens):
+            mat = self._embed_batch([miss[i] for i in batch])
+            out[todo[batch]] = mat
+            if cache is not None:
+                cache.add([miss[i] for i in batch], mat)
+        return out
+
+    def embed_query(self, query: str) -> np.ndarray:
+        return self.embed_queries([query])[0]
+
+    def search_many(
+        self,
+        queries: List[str],
+        filters: List[Set[str] | None] | None = None,
+        top_k: int = None,
+        overretrieve: int = None,
+    ) -> List[List[Dict]]:
+        """
+        여러 쿼리를 한 번에 검색합니다. 결과는 ``queries`` 순서대로 ``search``와 같은 형식입니다.
+
+        쿼리 임베딩은 배치 API 호출로, FAISS 검색은 한 번의 multi-row ``index.search``로
+        처리한 뒤 쿼리별 엔티티 필터를 적용합니다. ``FILTER_MODE=native``에서 필터를
+        통과한 결과가 ``top_k``보다 적은 쿼리만 후보 행 검색(``_filtered_search``)으로 다시 채웁니다.
+
+        Args:
+            queries: 검색 쿼리 목록
+            filters: 쿼리별 필터 엔티티 집합 목록 (None이면 전부 필터링 안함)
+            top_k: 쿼리당 결과 수 (기본값: config.embedding_top_k)
+            overretrieve: 필터가 있는 쿼리의 여유 검색 배수 (기본값: config.overretrieve_factor)
+        """
+        if filters is not None and len(filters) != len(queries):
+            raise ValueError(f"Got {len(filters)} filters for {len(queries)} queries")
+        if not queries:
+            return []
+
+        # 1️⃣ 쿼리 임베딩 (배치)
+        q_mat = self.embed_queries(queries)
+        return self.search_vectors(q_mat, filters, top_k, overretrieve)
+
+    def search_vectors(
+        self,
+        q_mat: np.ndarray,
+        filters: List[Set[str] | None] | None = None,
+        top_k: int = None,
+        overretrieve: int = None,
+    ) -> List[List[Dict]]:
+        """``search_many`` for already embedded (L2-normalised) query rows.
+
+        샤드 검색처럼 같은 쿼리 벡터를 여러 인덱스에 보낼 때 임베딩을 한 번만 하도록 분리했습니다.
+        """
+        if top_k is None:
+            top_k = config.embedding_top_k
+        if overretrieve is None:
+            overretrieve = config.overretrieve_factor
+        if filters is None:
+            filters = [None] * len(q_mat)
+        if len(filters) != len(q_mat):
+            raise ValueError(f"Got {len(filters)} filters for {len(q_mat)} query vectors")
+        if len(q_mat) == 0:
+            return []
+
+        if FILTER_MODE == "adaptive" and any(filters):
+            return self._adaptive_search(q_mat, top_k, filters)
+
+        # 2️⃣ FAISS 검색 한 번 – 필터가 하나라도 있으면 다 같이 여유 있게
+        D, I = self._ann_search(q_mat, self._search_k(top_k, overretrieve, any(filters)))
+
+        # 3️⃣ 쿼리별 필터 적용, 모자라면 후보 행 안에서 다시 검색
         results = []
-        for rank, idx in enumerate(I[0], start=1):
-            if idx < 0:                 # padding 값(-1) 방어
-                continue
-            p = self.payloads[idx]
+        for qi, ents in enumerate(filters):
+            res = self._collect_results(D[qi], I[qi], top_k, ents)
+            if ents and len(res) < top_k and FILTER_MODE == "native":
+                rows = self.candidate_rows(ents)
+                if len(rows) > len(res):
+                    D_q, I_q = self._filtered_search(q_mat[qi:qi + 1], top_k, rows)
+                    res = self._collect_results(D_q[0], I_q[0], top_k, ents)
+            results.append(res)
+        return results
+
+    def _adaptive_search(self, q_mat: np.ndarray, top_k: int, filters: List[Set[str] | None]) -> List[List[Dict]]:
+        """Grow k geometrically until every query has ``top_k`` filtered hits or k covers the index.
 
-            # 엔티티 필터링
-            if filter_entities and (
-                p["source"] not in filter_entities
-                and p["target"] not in filter_entities
-            ):
+        Each round is one multi-row search over the queries that are still short,
+        starting at ``top_k * ADAPTIVE_START_FACTOR``; rounds per query are counted
+        in :attr:`adaptive_rounds`.
+        """
+        n = int(self.index.ntotal)
+        results: List[List[Dict]] = [[] for _ in filters]
+        pending = np.arange(len(filters))
+        k = min(max(top_k * ADAPTIVE_START_FACTOR, top_k + len(self.tombstones)), n)
+        rounds = 0
+        while len(pending) and k > 0:
+            rounds += 1
+            D, I = self._ann_search(q_mat[pending], k)
+            short = []
+            for j, qi in enumerate(pending):
+                results[qi] = self._collect_results(D[j], I[j], top_k, filters[qi])
+                if len(results[qi]) < top_k and k < n:
+                    short.append(qi)
+                else:
+                    with self._stats_lock:
+                        self.adaptive_rounds[rounds] += 1
+            pending = np.asarray(short, dtype=np.int64)
+            k = min(max(k * ADAPTIVE_GROWTH, k + 1), n)
+        return results
+
+    def adaptive_stats(self) -> Dict:
+        """Summary of :attr:`adaptive_rounds` (searches, mean/max rounds, histogram)."""
+        with self._stats_lock:
+            hist = dict(sorted(self.adaptive_rounds.items()))
+        total = sum(hist.values())
+        return {
+            "searches": total,
+            "mean_rounds": sum(r * c for r, c in hist.items()) / total if total else 0.0,
+            "max_rounds": max(hist, default=0),
+            "histogram": hist,
+        }
+
+    def _collect_results(
+        self,
+        scores: np.ndarray,
+        rows: np.ndarray,
+        top_k: int,
+        filter_entities: Set[str] | None,
+    ) -> List[Dict]:
+        results = []
+        for score, idx in zip(scores, rows):
+            if idx < 0 or self.payloads.is_tombstone(idx):   # padding(-1) / 삭제된 행
                 continue
+            p = self.payloads[idx]      # 반환되는 행만 dict로 변환
 
+            # 엔티티 필터링: 문장에 연결된 엣지 중 필터에 걸리는 것만 남김
+            edges = p["edges"]
+            if filter_entities:
+                edges = [
+                    e for e in edges
+                    if e["source"] in filter_entities or e["target"] in filter_entities
+                ]
+                if not edges:
+                    continue
+
+            first = edges[0]
             results.append({
-                "edge_id" : p["edge_id"],
-                "source"  : p["source"],
-                "target"  : p["target"],
-                "label"   : p.get("label"),
+                "edge_id" : first["edge_id"],
+                "source"  : first["source"],
+                "target"  : first["target"],
+                "label"   : first.get("label"),
                 "sentence": p.get("sentence"),
                 "chunk_id": p.get("chunk_id"),
-                "score"   : float(D[0][rank - 1]),
+                "edges"   : edges,
+                "score"   : float(score),
                 "rank"    : len(results) + 1,
             })
 
@@ -230,10 +961,28 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Edge embedding for KGRAG")
     parser.add_argument("--dataset", required=True, help="Dataset name")
     parser.add_argument("--rebuild", action="store_true", help="Force rebuild index")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Embed only new edge sentences and append them to the existing index")
+    parser.add_argument("--backend", default=EMBED_BACKEND, choices=["openai", "local", "stub"],
+                        help="Embedding backend (local = sentence-transformers on this machine)")
+    parser.add_argument("--stub", action="store_true",
+                        help="Shorthand for --backend stub (offline fake vectors)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Bypass the persistent sentence embedding cache")
+    parser.add_argument("--index-type", default=EDGE_INDEX_TYPE,
+                        help="faiss.index_factory string, e.g. Flat, HNSW32, 'IVF4096,Flat'")
+    parser.add_argument("--vector-storage", default=EDGE_VECTOR_STORAGE,
+                        help="float32 (default), float16, int8 or a faiss code such as PQ64")
+    parser.add_argument("--labels", action="store_true",
+                        help="Also (re)build the topic/subtopic label index (default: only when a shortlist size is set)")
+    parser.add_argument("--search-param", action="append", default=[], metavar="NAME=VALUE",
+                        help="Update a persisted query-time parameter (nprobe, efSearch, rerank) of an existing index")
     
     args = parser.parse_args()
     
     config = get_config(args.dataset)
+
+    backend = "stub" if args.stub else args.backend
     
     embedder = EdgeEmbedderFAISS(
         gexf_path=str(config.get_graph_gexf_file()),
@@ -242,21 +991,45 @@ if __name__ == "__main__":
         openai_api_key=OPENAI_API_KEY,
         index_path=str(config.get_edge_index_file()),
         payload_path=str(config.get_edge_payload_file()),
+        backend=backend,
+        cache_dir=None if args.no_cache else EMBED_CACHE_DIR,
+        index_type=args.index_type,
+        vector_storage=args.vector_storage,
     )
 
     index_path = config.get_edge_index_file()
-    if not index_path.exists() or args.rebuild:
+    if args.search_param:
+        embedder.load_index()
+        params = {k: int(v) for k, v in (p.split("=", 1) for p in args.search_param)}
+        print("Search params updated:", embedder.set_search_params(**params))
+        sys.exit(0)
+    unchanged = False
+    if args.incremental and not args.rebuild:
+        stats = embedder.update_index()
+        unchanged = not (stats["added_edges"] or stats["removed_edges"])
+        print("FAISS index 증분 업데이트 완료:", ", ".join(f"{k}={v}" for k, v in stats.items()))
+    elif not index_path.exists() or args.rebuild:
         embedder.build_index()
         print("FAISS index & payloads 생성 완료.")
-        
-        # 파이프라인 상태 업데이트
-        state = config.load_pipeline_state() or {}
-        state[args.dataset] = state.get(args.dataset, {})
-        state[args.dataset]['edge_embedding'] = {
-            'completed': True,
-            'index_file': str(config.get_edge_index_file()),
-            'payload_file': str(config.get_edge_payload_file())
-        }
-        config.save_pipeline_state(state)
     else:
-        print("FAISS index already exists. Use --rebuild to force rebuild.")
\ No newline at end of file
+        print("FAISS index already exists. Use --rebuild to force rebuild or --incremental to update.")
+        sys.exit(0)
+
+    # topic / subtopic label embeddings – only needed for TOPIC_ / SUBTOPIC_SHORTLIST_SIZE
+    # (otherwise build them on demand with index/label_index.py)
+    from index.label_index import LabelIndex, build_label_index, label_index_dir_for
+    label_dir = label_index_dir_for(config.get_graph_gexf_file())
+    wants_labels = args.labels or config.topic_shortlist_size > 0 or config.subtopic_shortlist_size > 0
+    if wants_labels and not (unchanged and LabelIndex.exists(label_dir)):
+        build_label_index(embedder.graph, embedder, label_dir)
+        print(f"🏷️  label index saved: {label_dir}")
+
+    # 파이프라인 상태 업데이트
+    state = config.load_pipeline_state() or {}
+    state[args.dataset] = state.get(args.dataset, {})
+    state[args.dataset]['edge_embedding'] = {
+        'completed': True,
+        'index_file': str(config.get_edge_index_file()),
+        'payload_file': str(config.get_edge_payload_file())
+    }
+    config.save_pipeline_state(state)
@@ -0,0 +1,138 @@
+"""
+Embedding backends for ``EdgeEmbedderFAISS``.
+
+The embedder talks to every backend through the OpenAI call shape
+``client.embeddings.create(input=[...], model=...)``, so a backend is just an
+object exposing that method:
+
+* ``openai``  – :class:`openai.OpenAI` (default)
+* ``local``   – :class:`SentenceTransformerClient`, CPU/GPU inference with
+  sentence-transformers, no network access
+* ``stub``    – :class:`index.stub_embedding.StubEmbeddingClient`, deterministic
+  fake vectors for offline tests and benchmarks
+
+Backends may advertise how they want to be fed through two optional attributes
+read by the embedder: ``max_batch_items`` / ``max_batch_tokens`` (request size;
+``None`` tokens = no token budget) and ``max_concurrency`` (parallel requests).
+"""
+
+from __future__ import annotations
+
+import atexit
+import threading
+from types import SimpleNamespace
+from typing import List
+
+import numpy as np
+
+EMBED_BACKENDS = ("openai", "local", "stub")
+
+
+def model_identity(backend: str, model: str) -> str:
+    """Name under which vectors of *model* from *backend* are cached and recorded."""
+    return model if backend == "openai" else f"{backend}:{model}"
+
+
+class _LocalEmbeddings:
+    def __init__(self, owner: "SentenceTransformerClient") -> None:
+        self._owner = owner
+
+    def create(self, input, model: str, **_kwargs):
+        texts: List[str] = [input] if isinstance(input, str) else list(input)
+        vecs = self._owner.encode(texts)
+        data = [
+            SimpleNamespace(index=i, embedding=v, object="embedding")
+            for i, v in enumerate(vecs)
+        ]
+        return SimpleNamespace(data=data, model=model, object="list")
+
+
+class SentenceTransformerClient:
+    """Local sentence-transformers model behind the ``embeddings.create`` interface.
+
+    Small inputs (queries) are encoded in-process with batched inference. Inputs
+    of at least ``multi_process_min`` texts (index builds) are spread over a pool
+    of ``processes`` worker processes via ``encode_multi_process``; the pool is
+    started on first use and stopped at exit.
+
+    Args:
+        model: Hugging Face model id or local path, e.g. ``all-MiniLM-L6-v2``.
+        device: torch device for in-process encoding (``cpu``, ``cuda``, ...).
+        batch_size: Sentences per forward pass.
+        processes: Worker processes for large inputs (``<= 1`` disables the pool).
+        multi_process_min: Input size from which the process pool is used.
+    """
+
+    # Large requests keep the process pool busy; threads would only contend for it
+    max_batch_items = 8192
+    max_batch_tokens = None
+    max_concurrency = 1
+
+    def __init__(
+        self,
+        model: str,
+        device: str = "cpu",
+        batch_size: int = 64,
+        processes: int = 0,
+        multi_process_min: int = 2048,
+    ) -> None:
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "EMBED_BACKEND=local needs sentence-transformers (pip install sentence-transformers)"
+            ) from e
+
+        self.model_name = model
+        self.device = device
+        self.batch_size = batch_size
+        self.processes = processes
+        self.multi_process_min = multi_process_min
+        self.model = SentenceTransformer(model, device=device)
+        self._pool = None
+        self._lock = threading.Lock()
+        self.embeddings = _LocalEmbeddings(self)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        if self.processes > 1 and len(texts) >= self.multi_process_min:
+            return self.model.encode_multi_process(texts, self._get_pool(), batch_size=self.batch_size)
+        with self._lock:   # one forward pass at a time; torch already uses all cores
+            return self.model.encode(
+                texts,
+                batch_size=self.batch_size,
+                convert_to_numpy=True,
+                show_progress_bar=False,
+            )
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = self.model.start_multi_process_pool(target_devices=["cpu"] * self.processes)
+                atexit.register(self.close)
+            return self._pool
+
+    def close(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self.model.stop_multi_process_pool(self._pool)
+                self._pool = None
+
+
+def make_embedding_client(backend: str, model: str, openai_api_key: str | None = None):
+    """Build the embedding client for *backend* (see module docstring)."""
+    if backend == "openai":
+        from openai import OpenAI
+        return OpenAI(api_key=openai_api_key)
+    if backend == "local":
+        from config import get_config
+        config = get_config()
+        return SentenceTransformerClient(
+            model,
+            device=config.embed_local_device,
+            batch_size=config.embed_local_batch_size,
+            processes=config.embed_local_processes,
+        )
+    if backend == "stub":
+        from index.stub_embedding import StubEmbeddingClient
+        return StubEmbeddingClient()
+    raise ValueError(f"Unknown embedding backend '{backend}' (expected one of {', '.join(EMBED_BACKENDS)})")
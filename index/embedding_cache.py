@@ -0,0 +1,251 @@
+"""
+Persistent, content-addressed cache for sentence embeddings.
+
+Vectors are keyed by ``(embedding model, dimension, blake2b(sentence))`` and live
+in one directory per model/dimension pair::
+
+    <cache_dir>/<model>-<dim>/
+        meta.json      model name, dimension, key scheme
+        vectors.f32    float32 matrix, one row per cached sentence (memory-mapped)
+        keys.bin       16-byte sentence digests, row ``i`` ↔ digest ``i``
+        .lock          writer lock
+
+Both data files are append-only. A writer appends vector rows first and the
+matching digests second, so a digest is only ever visible once its vector is on
+disk; readers in other processes simply pick up new digests on their next
+lookup. Torn writes (vectors without digests) are truncated by the next writer.
+
+:class:`QueryEmbeddingCache` is the query-time counterpart: a bounded in-memory
+LRU, optionally backed by an :class:`EmbeddingCache` directory.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from glob import escape as glob_escape
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+KEY_SIZE = 16
+
+
+def sentence_key(text: str) -> bytes:
+    """Content hash used as the cache key for *text*."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=KEY_SIZE).digest()
+
+
+def cached_dims(cache_dir: str | Path, model: str) -> List[int]:
+    """Dimensions for which *cache_dir* already holds an ``EmbeddingCache`` of *model*."""
+    safe_model = re.sub(r"[^\w\-\.]", "_", model)
+    dims = []
+    for meta_path in sorted(Path(cache_dir).glob(f"{glob_escape(safe_model)}-*/meta.json")):
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if meta.get("model") == model and meta.get("dim"):
+            dims.append(int(meta["dim"]))
+    return dims
+
+
+class EmbeddingCache:
+    """On-disk sentence → vector cache for one (model, dim) pair."""
+
+    def __init__(self, cache_dir: str | Path, model: str, dim: int) -> None:
+        self.model = model
+        self.dim = int(dim)
+        safe_model = re.sub(r"[^\w\-\.]", "_", model)
+        self.dir = Path(cache_dir) / f"{safe_model}-{self.dim}"
+        self.dir.mkdir(parents=True, exist_ok=True)
+
+        self.vectors_path = self.dir / "vectors.f32"
+        self.keys_path = self.dir / "keys.bin"
+        self.lock_path = self.dir / ".lock"
+
+        meta_path = self.dir / "meta.json"
+        if not meta_path.exists():
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump({"model": model, "dim": self.dim, "key": f"blake2b-{KEY_SIZE * 8}"}, f)
+        self.vectors_path.touch(exist_ok=True)
+        self.keys_path.touch(exist_ok=True)
+
+        self._rows: Dict[bytes, int] = {}
+        self._keys_read = 0
+        self._mmap: np.memmap | None = None
+        self._mmap_rows = 0
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._rows)
+
+    def __contains__(self, text: str) -> bool:
+        with self._lock:
+            self._refresh()
+            return sentence_key(text) in self._rows
+
+    @contextmanager
+    def _file_lock(self):
+        with open(self.lock_path, "a+b") as fh:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def _refresh(self) -> None:
+        """Pick up digests appended since the last read (by us or other processes)."""
+        size = os.path.getsize(self.keys_path)
+        size -= size % KEY_SIZE
+        if size > self._keys_read:
+            with open(self.keys_path, "rb") as f:
+                f.seek(self._keys_read)
+                blob = f.read(size - self._keys_read)
+            start = self._keys_read // KEY_SIZE
+            for i in range(len(blob) // KEY_SIZE):
+                self._rows.setdefault(blob[i * KEY_SIZE:(i + 1) * KEY_SIZE], start + i)
+            self._keys_read = size
+
+        n_rows = self._keys_read // KEY_SIZE
+        if n_rows and n_rows != self._mmap_rows:
+            self._mmap = np.memmap(self.vectors_path, dtype="float32", mode="r", shape=(n_rows, self.dim))
+            self._mmap_rows = n_rows
+
+    # ------------------------------------------------------------------
+    def lookup(self, texts: List[str], out: np.ndarray) -> np.ndarray:
+        """Copy cached vectors into ``out[i]`` for every cached ``texts[i]``.
+
+        Returns a boolean hit mask aligned with *texts*.
+        """
+        with self._lock:
+            self._refresh()
+            rows = np.fromiter(
+                (self._rows.get(sentence_key(t), -1) for t in texts), dtype=np.int64, count=len(texts)
+            )
+            hit = rows >= 0
+            if hit.any():
+                out[hit] = self._mmap[rows[hit]]
+        return hit
+
+    def add(self, texts: List[str], vecs: np.ndarray) -> int:
+        """Append vectors for texts not cached yet. Returns the number of rows written."""
+        vecs = np.ascontiguousarray(vecs, dtype="float32")
+        if vecs.ndim != 2 or vecs.shape[1] != self.dim:
+            raise ValueError(f"Expected vectors of shape (n, {self.dim}), got {vecs.shape}")
+
+        with self._lock, self._file_lock():
+            self._refresh()
+            keys, rows = [], []
+            pending = set()
+            for i, t in enumerate(texts):
+                k = sentence_key(t)
+                if k in self._rows or k in pending:
+                    continue
+                pending.add(k)
+                keys.append(k)
+                rows.append(i)
+            if not keys:
+                return 0
+
+            n_rows = self._keys_read // KEY_SIZE
+            row_bytes = self.dim * 4
+            # Drop vector rows left behind by a writer that died before writing keys
+            if os.path.getsize(self.vectors_path) != n_rows * row_bytes:
+                with open(self.vectors_path, "r+b") as f:
+                    f.truncate(n_rows * row_bytes)
+
+            with open(self.vectors_path, "ab") as f:
+                f.write(vecs[rows].tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self.keys_path, "ab") as f:
+                f.write(b"".join(keys))
+                f.flush()
+                os.fsync(f.fileno())
+
+            self._refresh()
+            return len(keys)
+
+
+class QueryEmbeddingCache:
+    """Bounded, thread-safe LRU of query vectors keyed by ``(model, query text)``.
+
+    Sits in front of the query-time embedding call. With *persist_dir* every
+    newly embedded query is also appended to an :class:`EmbeddingCache` there,
+    so later runs (parameter sweeps, repeated evaluations) start warm; vectors
+    found on disk are promoted into the in-memory LRU.
+    """
+
+    def __init__(self, model: str, dim: int, maxsize: int = 4096, persist_dir: str | Path | None = None) -> None:
+        self.model = model
+        self.dim = int(dim)
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._lru: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = EmbeddingCache(persist_dir, model, dim) if persist_dir else None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._lru)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._lru), "maxsize": self.maxsize}
+
+    def _remember(self, key: tuple, vec: np.ndarray) -> None:
+        self._lru[key] = vec
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.maxsize:
+            self._lru.popitem(last=False)
+
+    def lookup(self, queries: List[str], out: np.ndarray) -> np.ndarray:
+        """Fill ``out[i]`` for every cached ``queries[i]``; returns the hit mask."""
+        hit = np.zeros(len(queries), dtype=bool)
+        with self._lock:
+            for i, q in enumerate(queries):
+                vec = self._lru.get((self.model, q))
+                if vec is not None:
+                    self._lru.move_to_end((self.model, q))
+                    out[i] = vec
+                    hit[i] = True
+        if self._disk is not None and not hit.all():
+            todo = np.flatnonzero(~hit)
+            disk_out = np.empty((len(todo), self.dim), dtype="float32")
+            disk_hit = self._disk.lookup([queries[i] for i in todo], disk_out)
+            out[todo[disk_hit]] = disk_out[disk_hit]
+            hit[todo[disk_hit]] = True
+            with self._lock:
+                for i, vec in zip(todo[disk_hit], disk_out[disk_hit]):
+                    self._remember((self.model, queries[i]), vec.copy())
+        with self._lock:
+            self.hits += int(hit.sum())
+            self.misses += int(len(queries) - hit.sum())
+        return hit
+
+    def add(self, queries: List[str], vecs: np.ndarray) -> None:
+        vecs = np.asarray(vecs, dtype="float32")
+        with self._lock:
+            for q, vec in zip(queries, vecs):
+                self._remember((self.model, q), vec.copy())
+        if self._disk is not None:
+            self._disk.add(queries, vecs)
@@ -0,0 +1,134 @@
+"""
+Precomputed topic → subtopic → entity hierarchy of the knowledge graph.
+
+Retrieval used to walk ``graph.neighbors()`` and look up ``graph.nodes[nb]["type"]``
+for every neighbour of every chosen topic / subtopic on each query.
+:class:`GraphHierarchy` does that walk once and keeps two CSR posting lists over
+integer node ids:
+
+* ``sub_ptr`` / ``sub_idx``  – subtopic children of each topic node
+* ``ent_ptr`` / ``ent_idx``  – entity children of each subtopic node
+
+Children keep the graph's neighbour order, so ``subtopics_of`` returns exactly
+what ``extract_subtopics_for_topic`` used to, and the entity set of a list of
+subtopics is one ``np.concatenate`` + ``np.unique`` over the posting slices.
+
+For a :class:`~index.graph_snapshot.CSRGraph` (snapshot or serving graph) the
+lists are cut out of its CSR adjacency with numpy masks; an ``nx.Graph`` is walked once in
+Python. Graphs are treated as read-only once a hierarchy has been built for them.
+A disk-backed :class:`~index.graph_store.GraphStore` answers the same lookups
+from its ``(node, type)`` adjacency index and is returned as is.
+"""
+
+from __future__ import annotations
+
+import sys
+import threading
+import weakref
+from pathlib import Path
+from typing import Dict, Iterable, List, Set, Tuple
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from index.graph_snapshot import CSRGraph
+from index.graph_store import GraphStore
+
+
+def _csr(n: int, parents: np.ndarray, children: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """CSR (ptr, idx) of ``parents → children`` pairs already grouped by parent."""
+    ptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(parents, minlength=n), out=ptr[1:])
+    return ptr, children.astype(np.int32)
+
+
+class GraphHierarchy:
+    """topic → subtopic and subtopic → entity posting lists of one graph."""
+
+    def __init__(self, graph) -> None:
+        if isinstance(graph, CSRGraph):
+            self._from_csr(graph)
+        else:
+            self._from_networkx(graph)
+
+    def _from_csr(self, g: CSRGraph) -> None:
+        self.node_ids = g.node_ids
+        self._index = g.node_index
+        n = g.num_nodes
+        types = g.node_attrs["type"]
+        codes = {types.table[i]: i for i in range(len(types.table))}
+        type_of = np.asarray(types.values)
+
+        src = np.repeat(np.arange(n, dtype=np.int32), np.diff(np.asarray(g.adj_ptr)))
+        dst = np.asarray(g.adj_nodes)
+
+        def edges_between(parent: str, child: str):
+            mask = (type_of[src] == codes.get(parent, -2)) & (type_of[dst] == codes.get(child, -2))
+            return _csr(n, src[mask], dst[mask])
+
+        self.sub_ptr, self.sub_idx = edges_between("topic", "subtopic")
+        self.ent_ptr, self.ent_idx = edges_between("subtopic", "entity")
+        labels = g.node_attrs.get("label")
+        self.labels = {int(i): (labels[int(i)] if labels is not None else "") or "" for i in np.unique(self.sub_idx)}
+
+    def _from_networkx(self, graph) -> None:
+        self.node_ids = list(graph.nodes())
+        index = {nid: i for i, nid in enumerate(self.node_ids)}
+        self._index = lambda nid: index.get(nid, -1)
+        n = len(self.node_ids)
+        type_of = [graph.nodes[nid].get("type") for nid in self.node_ids]
+
+        pairs: Dict[str, Tuple[List[int], List[int]]] = {"subtopic": ([], []), "entity": ([], [])}
+        for i, nid in enumerate(self.node_ids):
+            child = {"topic": "subtopic", "subtopic": "entity"}.get(type_of[i])
+            if child is None:
+                continue
+            parents, children = pairs[child]
+            for nb in graph.neighbors(nid):
+                j = index[nb]
+                if type_of[j] == child:
+                    parents.append(i)
+                    children.append(j)
+
+        self.sub_ptr, self.sub_idx = _csr(n, np.asarray(pairs["subtopic"][0], dtype=np.int64),
+                                          np.asarray(pairs["subtopic"][1], dtype=np.int64))
+        self.ent_ptr, self.ent_idx = _csr(n, np.asarray(pairs["entity"][0], dtype=np.int64),
+                                          np.asarray(pairs["entity"][1], dtype=np.int64))
+        self.labels = {int(i): graph.nodes[self.node_ids[i]].get("label", "") for i in np.unique(self.sub_idx)}
+
+    # ------------------------------------------------------------------
+    def subtopics_of(self, topic_nid: str) -> List[Tuple[str, str]]:
+        """``[(sub_nid, sub_label), ...]`` of *topic_nid*, in neighbour order."""
+        i = self._index(topic_nid)
+        if i < 0:
+            return []
+        return [(self.node_ids[int(j)], self.labels[int(j)])
+                for j in self.sub_idx[self.sub_ptr[i]:self.sub_ptr[i + 1]]]
+
+    def entity_ids_under(self, sub_nids: Iterable[str]) -> np.ndarray:
+        """Sorted unique integer ids of the entities below the given subtopics."""
+        rows = [i for i in (self._index(s) for s in sub_nids if s) if i >= 0]
+        if not rows:
+            return np.zeros(0, dtype=np.int32)
+        return np.unique(np.concatenate([self.ent_idx[self.ent_ptr[i]:self.ent_ptr[i + 1]] for i in rows]))
+
+    def entities_under(self, sub_nids: Iterable[str]) -> Set[str]:
+        """Entity node ids below the given subtopics (unknown ids are skipped)."""
+        return {self.node_ids[int(i)] for i in self.entity_ids_under(sub_nids)}
+
+
+_hierarchies: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_hierarchies_lock = threading.Lock()
+
+
+def hierarchy_for(graph) -> GraphHierarchy | GraphStore:
+    """The (cached) :class:`GraphHierarchy` of *graph*, built on first use."""
+    if isinstance(graph, GraphStore):
+        return graph    # loading every posting list would defeat a disk-backed store
+    with _hierarchies_lock:
+        h = _hierarchies.get(graph)
+        if h is None:
+            h = _hierarchies[graph] = GraphHierarchy(graph)
+        return h
@@ -0,0 +1,411 @@
+"""
+Topic-partitioned graph + edge index shards.
+
+Retrieval only ever searches the entities below the handful of topics
+``choose_topics_from_graph`` picks, yet every process used to load the whole
+graph and the whole edge index. This module cuts both by topic::
+
+    <name>_shards/
+        manifest.json            topic id → shard, per-shard counts, embedding model
+        router.snapshot/         topic + subtopic nodes only (topic / subtopic choice)
+        shard_000/
+            graph.snapshot/      the shard's topics, their subtopics and entities,
+                                 every predicate edge touching one of those entities
+            edge_index.faiss     edge index over the shard's sentences
+            edge_payloads/
+
+Topics are packed into ``num_shards`` groups of similar size (greedy, largest
+topic first, cost = predicate edges below the topic). An entity below topics
+of several shards, and a predicate edge between entities of different shards,
+is stored in each of them, so a shard answers any filter built from its own
+topics exactly as the full index would.
+
+:class:`ShardSet` opens shards lazily; ``Retriever(shards_dir=...)`` routes
+each query's entity filter to the shards of its chosen topics, sends the query
+vector to just those (scatter) and merges the per-shard top-k (gather). A
+shard is a plain directory loaded by one ``EdgeEmbedderFAISS``, so it can be
+served from its own process or machine; the transport for that is not part of
+this module.
+
+    python index/graph_partition.py --dataset hotpotQA --shards 8
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import sys
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Set
+
+import networkx as nx
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from config import get_config
+from index.ann_index import flat_vectors
+from index.edge_embedding import (
+    EDGE_INDEX_TYPE, EDGE_VECTOR_STORAGE, EMBED_BACKEND, EMBED_CACHE_DIR, EMBEDDING_MODEL,
+    OPENAI_API_KEY, EdgeEmbedderFAISS,
+)
+from index.graph_hierarchy import hierarchy_for
+from index.graph_snapshot import CSRGraph, GEXF_EDGE_KEYS, SnapshotGraph, load_graph, write_graph_snapshot
+from index.payload_store import replace_dir
+
+config = get_config()
+GRAPH_NUM_SHARDS = config.graph_num_shards
+MAX_WORKERS = config.max_workers
+
+MANIFEST_VERSION = 1
+MULTI_VALUED = ("label", "sentence")
+
+
+def shard_dir_name(shard: int) -> str:
+    return f"shard_{shard:03d}"
+
+
+# ---------------------------------------------------------------------------
+# Partitioning
+# ---------------------------------------------------------------------------
+
+def plan_partitions(graph, num_shards: int) -> List[List[str]]:
+    """Group the topic nodes of *graph* into at most *num_shards* balanced shards.
+
+    Returns one list of topic ids per (non-empty) shard, in graph order.
+    """
+    h = hierarchy_for(graph)
+    topics = [n for n, d in graph.nodes(data=True) if d.get("type") == "topic"]
+    cost = {}
+    for t in topics:
+        entities = h.entities_under(sub for sub, _lbl in h.subtopics_of(t))
+        cost[t] = 1 + sum(sum(1 for _ in graph.neighbors(e)) for e in entities)
+
+    num_shards = max(1, min(num_shards, len(topics)))
+    loads = [0] * num_shards
+    groups: List[List[str]] = [[] for _ in range(num_shards)]
+    order = {t: i for i, t in enumerate(topics)}
+    for t in sorted(topics, key=lambda t: (-cost[t], order[t])):
+        s = min(range(num_shards), key=lambda s: (loads[s], s))
+        loads[s] += cost[t]
+        groups[s].append(t)
+    return [sorted(g, key=order.get) for g in groups if g]
+
+
+def _multi_values(graph, row: int) -> Dict | None:
+    """Snapshot list values (labels / sentences) of edge *row*, when *graph* keeps them."""
+    if not isinstance(graph, CSRGraph):
+        return None
+    values = {name: graph.edge_values(row, name) for name in MULTI_VALUED
+              if graph.edge_attr_kind(name) == "strlist"}
+    values = {k: v for k, v in values.items() if v is not None}
+    return values or None
+
+
+def split_graph(graph, groups: List[List[str]]):
+    """Shard subgraphs of *graph* for the topic *groups* of ``plan_partitions``.
+
+    Returns ``(subgraphs, multi_values)``: one ``nx.Graph`` per group (nodes and
+    edges in the order of *graph*) and, per group, the ``write_graph_snapshot``
+    multi-value map of its edges.
+    """
+    h = hierarchy_for(graph)
+    member: Dict[str, Set[int]] = defaultdict(set)
+    for s, topics in enumerate(groups):
+        for t in topics:
+            member[t].add(s)
+            for sub, _lbl in h.subtopics_of(t):
+                member[sub].add(s)
+                for e in h.entities_under([sub]):
+                    member[e].add(s)
+
+    types = {n: d.get("type") for n, d in graph.nodes(data=True)}
+    shard_nodes: List[Set[str]] = [set() for _ in groups]
+    shard_edges: List[List] = [[] for _ in groups]
+    for row, (u, v, d) in enumerate(graph.edges(data=True)):
+        if types.get(u) == types.get(v) == "entity":
+            shards = member.get(u, set()) | member.get(v, set())   # predicate edge: every shard of either end
+        else:
+            shards = member.get(u, set()) & member.get(v, set())   # hierarchy edge: stays inside its topic
+        for s in shards:
+            shard_nodes[s].update((u, v))
+            shard_edges[s].append((row, u, v, d))
+
+    subgraphs, multi = [], []
+    for s in range(len(groups)):
+        keep = shard_nodes[s] | {n for n, shards in member.items() if s in shards}
+        H = nx.Graph()
+        H.add_nodes_from((n, dict(graph.nodes[n])) for n in graph.nodes() if n in keep)
+        values = {}
+        for row, u, v, d in shard_edges[s]:
+            H.add_edge(u, v, **{k: x for k, x in d.items() if k not in GEXF_EDGE_KEYS})
+            lists = _multi_values(graph, row)
+            if lists:
+                values[(u, v)] = lists
+        subgraphs.append(H)
+        multi.append(values)
+    return subgraphs, multi
+
+
+def router_graph(graph) -> nx.Graph:
+    """Topic and subtopic nodes with the edges between them – all topic / subtopic choice needs."""
+    R = nx.Graph()
+    R.add_nodes_from((n, dict(d)) for n, d in graph.nodes(data=True) if d.get("type") in ("topic", "subtopic"))
+    for u, v, d in graph.edges(data=True):
+        if u in R and v in R:
+            R.add_edge(u, v, **{k: x for k, x in d.items() if k not in GEXF_EDGE_KEYS})
+    return R
+
+
+def seed_embedding_cache(full: EdgeEmbedderFAISS, batch_rows: int = 50000) -> int:
+    """Copy the vectors of an existing full edge index into the sentence embedding cache.
+
+    Shard builds then embed nothing. Only lossless vectors are copied (a flat
+    index or the exact vectors kept next to a quantised one). Returns the
+    number of cached sentences, 0 when there is nothing to reuse.
+    """
+    if not os.path.exists(full.index_path) or full.cache_dir is None:
+        return 0
+    try:
+        full.load_index(mmap=True)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"⚠️  not reusing {full.index_path}: {e}")
+        return 0
+    if full.exact_vectors is None and flat_vectors(full.index) is None:
+        return 0
+    cache = full.embedding_cache()
+    added = 0
+    for start in range(0, len(full.payloads), batch_rows):
+        rows = np.asarray([r for r in range(start, min(start + batch_rows, len(full.payloads)))
+                           if not full.payloads.is_tombstone(r)], dtype=np.int64)
+        if len(rows):
+            added += cache.add([full.payloads.sentences[int(r)] for r in rows], full._row_vectors(rows))
+    return added
+
+
+def build_shards(
+    gexf_path: str | Path,
+    json_path: str | Path,
+    out_dir: str | Path,
+    num_shards: int = GRAPH_NUM_SHARDS,
+    backend: str = EMBED_BACKEND,
+    index_type: str = EDGE_INDEX_TYPE,
+    vector_storage: str = EDGE_VECTOR_STORAGE,
+    cache_dir: str | None = EMBED_CACHE_DIR,
+    full_index_path: str | Path | None = None,
+    full_payload_path: str | Path | None = None,
+) -> Dict:
+    """Partition the graph of *gexf_path* and build one edge index per shard; returns the manifest."""
+    out_dir = Path(out_dir)
+    graph = load_graph(gexf_path)
+    groups = plan_partitions(graph, num_shards)
+    subgraphs, multi = split_graph(graph, groups)
+    print(f"🧩 {len(groups)} shards over {sum(map(len, groups))} topics")
+
+    tmp_dir = out_dir.with_name(out_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    def embedder(index_path, payload_path, graph=None, client=None, sent2cid=None) -> EdgeEmbedderFAISS:
+        return EdgeEmbedderFAISS(
+            gexf_path=str(gexf_path), json_path=str(json_path),
+            embedding_model=EMBEDDING_MODEL, openai_api_key=OPENAI_API_KEY,
+            index_path=str(index_path), payload_path=str(payload_path),
+            client=client, cache_dir=cache_dir, index_type=index_type,
+            vector_storage=vector_storage, backend=backend, graph=graph, sent2cid=sent2cid,
+        )
+
+    # one client for every shard build; the full index (if any) pre-fills the sentence cache
+    full = embedder(full_index_path or "", full_payload_path or "")
+    if full_index_path and full_payload_path:
+        reused = seed_embedding_cache(full)
+        if reused:
+            print(f"♻️  {reused} sentence vectors reused from {full_index_path}")
+
+    write_graph_snapshot(router_graph(graph), tmp_dir / "router.snapshot")
+    shards = []
+    for s, (topics, H, values) in enumerate(zip(groups, subgraphs, multi)):
+        shard_dir = tmp_dir / shard_dir_name(s)
+        snap = write_graph_snapshot(H, shard_dir / "graph.snapshot", values)
+        # sentence → chunk map parsed from the graph JSON once, shared by every shard
+        emb = embedder(shard_dir / "edge_index.faiss", shard_dir / "edge_payloads",
+                       graph=SnapshotGraph(snap), client=full.openai, sent2cid=full.sent2cid)
+        print(f"📦 shard {s}: {len(topics)} topics, {H.number_of_nodes()} nodes, {H.number_of_edges()} edges")
+        if emb.edges:
+            emb.build_index()
+        shards.append({
+            "id": s,
+            "dir": shard_dir_name(s),
+            "topics": topics,
+            "nodes": H.number_of_nodes(),
+            "edges": H.number_of_edges(),
+            "sentences": len(emb.payloads),
+        })
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "model": full.model_id,
+        "num_shards": len(shards),
+        "router": "router.snapshot",
+        "topics": {t: s for s, topics in enumerate(groups) for t in topics},
+        "shards": shards,
+    }
+    with open(tmp_dir / "manifest.json", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    replace_dir(tmp_dir, out_dir)
+    return manifest
+
+
+# ---------------------------------------------------------------------------
+# Serving
+# ---------------------------------------------------------------------------
+
+def merge_shard_results(parts: List[List[Dict]], top_k: int) -> List[Dict]:
+    """Gather step: one result per sentence (edges of every shard unioned), best *top_k* by score."""
+    best: Dict[str, Dict] = {}
+    for results in parts:
+        for r in results:
+            cur = best.get(r["sentence"])
+            if cur is None:
+                best[r["sentence"]] = dict(r, edges=list(r["edges"]))
+                continue
+            seen = {e["edge_id"] for e in cur["edges"]}
+            cur["edges"].extend(e for e in r["edges"] if e["edge_id"] not in seen)
+    merged = sorted(best.values(), key=lambda r: -r["score"])[:top_k]
+    for rank, r in enumerate(merged, 1):
+        r["rank"] = rank
+    return merged
+
+
+class _Shard:
+    def __init__(self, graph: SnapshotGraph, embedder: EdgeEmbedderFAISS) -> None:
+        self.graph = graph
+        self.hierarchy = hierarchy_for(graph)
+        self.embedder = embedder
+
+
+class ShardSet:
+    """The shards of one ``build_shards`` directory, each loaded on first use."""
+
+    def __init__(
+        self,
+        shards_dir: str | Path,
+        json_path: str,
+        embedding_model: str = EMBEDDING_MODEL,
+        openai_api_key: str = OPENAI_API_KEY,
+        backend: str = EMBED_BACKEND,
+        workers: int = MAX_WORKERS,
+    ) -> None:
+        self.dir = Path(shards_dir)
+        with open(self.dir / "manifest.json", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("version") != MANIFEST_VERSION:
+            raise ValueError(f"Unsupported shard manifest version in {self.dir}: {self.manifest.get('version')}")
+        self.router = SnapshotGraph(self.dir / self.manifest["router"])
+        self.shard_of: Dict[str, int] = self.manifest["topics"]
+        self.workers = workers
+        self._shards: Dict[int, _Shard] = {}
+        self._lock = threading.Lock()
+
+        def embedder(s: int, client=None) -> EdgeEmbedderFAISS:
+            shard_dir = self.dir / self.manifest["shards"][s]["dir"]
+            return EdgeEmbedderFAISS(
+                gexf_path="", json_path=json_path,
+                embedding_model=embedding_model, openai_api_key=openai_api_key,
+                index_path=str(shard_dir / "edge_index.faiss"),
+                payload_path=str(shard_dir / "edge_payloads"),
+                client=client, backend=backend,
+            )
+
+        self._embedder = embedder
+        # embedding a query needs no index: shard 0's (not yet loaded) embedder embeds for all shards
+        self.query_embedder = embedder(0)
+
+    def __len__(self) -> int:
+        return self.manifest["num_shards"]
+
+    def shard(self, s: int) -> _Shard:
+        with self._lock:
+            shard = self._shards.get(s)
+            if shard is None:
+                info = self.manifest["shards"][s]
+                emb = self.query_embedder if s == 0 else self._embedder(s, client=self.query_embedder.openai)
+                if info["sentences"]:
+                    emb.load_index()
+                graph = SnapshotGraph(self.dir / info["dir"] / "graph.snapshot")
+                shard = self._shards[s] = _Shard(graph, emb)
+            return shard
+
+    def entities_under(self, topic_nid: str, sub_nids: List[str]):
+        """``(shard, entity ids)`` below the chosen subtopics of *topic_nid* (shard None if unknown)."""
+        s = self.shard_of.get(topic_nid)
+        if s is None:
+            return None, set()
+        return s, self.shard(s).hierarchy.entities_under(sub_nids)
+
+    def search_vectors(
+        self,
+        q_mat: np.ndarray,
+        filters: List[Dict[int, Set[str]]],
+        top_k: int = None,
+        overretrieve: int = None,
+    ) -> List[List[Dict]]:
+        """Scatter each query row to the shards of its ``{shard: entities}`` filter, gather the top *top_k*."""
+        if top_k is None:
+            top_k = config.embedding_top_k
+        jobs: Dict[int, List] = defaultdict(list)
+        for qi, per_shard in enumerate(filters):
+            for s, ents in per_shard.items():
+                if ents and self.manifest["shards"][s]["sentences"]:
+                    jobs[s].append((qi, ents))
+
+        def run(s: int):
+            rows = [qi for qi, _ents in jobs[s]]
+            hits = self.shard(s).embedder.search_vectors(
+                q_mat[rows], [ents for _qi, ents in jobs[s]], top_k, overretrieve)
+            return rows, hits
+
+        parts: List[List[List[Dict]]] = [[] for _ in filters]
+        if jobs:
+            with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(jobs)))) as pool:
+                for rows, hits in pool.map(run, sorted(jobs)):   # fixed shard order → deterministic ties
+                    for qi, res in zip(rows, hits):
+                        parts[qi].append(res)
+        return [merge_shard_results(p, top_k) for p in parts]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Split graph + edge index into topic shards")
+    parser.add_argument("--dataset", required=True, help="Dataset name")
+    parser.add_argument("--shards", type=int, default=GRAPH_NUM_SHARDS, help="Number of shards")
+    parser.add_argument("--backend", default=EMBED_BACKEND, choices=["openai", "local", "stub"],
+                        help="Embedding backend (must match the one queries use)")
+    parser.add_argument("--stub", action="store_true", help="Shorthand for --backend stub (offline fake vectors)")
+    parser.add_argument("--index-type", default=EDGE_INDEX_TYPE, help="faiss.index_factory string per shard")
+    parser.add_argument("--vector-storage", default=EDGE_VECTOR_STORAGE, help="float32, float16, int8 or a faiss code")
+    args = parser.parse_args()
+
+    config = get_config(args.dataset)
+    manifest = build_shards(
+        gexf_path=config.get_graph_gexf_file(),
+        json_path=config.get_graph_json_file(),
+        out_dir=config.get_graph_shards_dir(),
+        num_shards=args.shards,
+        backend="stub" if args.stub else args.backend,
+        index_type=args.index_type,
+        vector_storage=args.vector_storage,
+        full_index_path=config.get_edge_index_file(),
+        full_payload_path=config.get_edge_payload_file(),
+    )
+    print(f"✅ {manifest['num_shards']} shards written to {config.get_graph_shards_dir()}")
+    for info in manifest["shards"]:
+        print(f"   {info['dir']}: {len(info['topics'])} topics, {info['nodes']} nodes, "
+              f"{info['edges']} edges, {info['sentences']} sentences")
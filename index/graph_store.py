@@ -0,0 +1,413 @@
+"""
+Disk-backed knowledge graph on SQLite, for graphs that do not fit in RAM.
+
+The snapshot (``index/graph_snapshot.py``) and ``ServingGraph`` still need the
+whole adjacency mapped or resident. :class:`GraphStore` keeps it in one SQLite
+file next to the GEXF (``<name>_graph.sqlite``) and reads only the rows a query
+touches::
+
+    nodes(idx, id, type, label, data)       UNIQUE(id), INDEX(type, label)
+    edges(row, u, v, data)                  data: JSON, multi-valued attrs as lists
+    adj(node, nbr_type, seq, nbr, edge)     PRIMARY KEY (node, nbr_type, seq), WITHOUT ROWID
+
+``adj`` is clustered by ``(node, neighbour type)``, so "subtopics of a topic" or
+"entities of a subtopic" is one index range scan; ``seq`` keeps the neighbour
+order of the source graph. An LRU of node rows and typed neighbour lists sits
+in front of the database, so hot topics and subtopics are served from memory;
+it is bounded by ``GRAPH_STORE_CACHE_SIZE`` items (one per node row, one per
+cached neighbour), since a broad subtopic alone can list thousands of entities.
+
+The store answers the small interface retrieval uses – ``nodes[nid]``,
+``neighbors_by_type``, ``subtopics_of`` / ``entities_under`` (it is its own
+:func:`~index.graph_hierarchy.hierarchy_for`), ``label_map`` / ``labels_of_type``
+(``node_label_map``, ``extract_graph_topic_labels``), ``edge_attrs_between`` –
+plus the read-only networkx subset of :class:`~index.graph_snapshot.CSRGraph`.
+Select it with ``GRAPH_SERVING_FORMAT=sqlite``.
+
+    python index/graph_store.py --dataset hotpotQA     # build <name>_graph.sqlite
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterator, List, Set, Tuple
+
+import networkx as nx
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from config import get_config
+from index.graph_snapshot import CSRGraph, GEXF_EDGE_KEYS, graph_arrays
+
+config = get_config()
+GRAPH_STORE_CACHE_SIZE = config.graph_store_cache_size
+
+STORE_VERSION = 1
+INSERT_BATCH = 50000
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE nodes (idx INTEGER PRIMARY KEY, id TEXT NOT NULL, type TEXT, label TEXT, data TEXT NOT NULL);
+CREATE TABLE edges (row INTEGER PRIMARY KEY, u INTEGER NOT NULL, v INTEGER NOT NULL, data TEXT NOT NULL);
+CREATE TABLE adj (
+    node INTEGER NOT NULL, nbr_type TEXT, seq INTEGER NOT NULL, nbr INTEGER NOT NULL, edge INTEGER NOT NULL,
+    PRIMARY KEY (node, nbr_type, seq)
+) WITHOUT ROWID;
+"""
+# built after the bulk insert – cheaper than maintaining them row by row
+INDEXES = """
+CREATE UNIQUE INDEX nodes_id ON nodes(id);
+CREATE INDEX nodes_type_label ON nodes(type, label);
+CREATE INDEX adj_pair ON adj(node, nbr);
+"""
+
+
+def store_path_for(gexf_path: str | Path) -> Path:
+    """SQLite store of a GEXF file (``foo_graph.gexf`` → ``foo_graph.sqlite``)."""
+    return Path(gexf_path).with_suffix(".sqlite")
+
+
+# ---------------------------------------------------------------------------
+# Writer
+# ---------------------------------------------------------------------------
+
+def _graph_rows(graph, multi_values: Dict = None):
+    """``(node_ids, node_records, edge_u, edge_v, edge_records, adj_ptr, adj_nodes, adj_edges)`` of *graph*.
+
+    A :class:`CSRGraph` is read row by row from its (mapped) arrays; an
+    ``nx.Graph`` goes through :func:`~index.graph_snapshot.graph_arrays`.
+    """
+    if not isinstance(graph, CSRGraph):
+        return graph_arrays(graph, multi_values)
+    lists = [name for name, col in graph.edge_attrs.items() if col.kind == "strlist"]
+
+    def edge_record(row: int) -> Dict:
+        d = graph.edge_data(row)
+        d.update({name: v for name in lists if (v := graph.edge_values(row, name)) is not None})
+        return d
+
+    return (
+        (graph.node_ids[i] for i in range(graph.num_nodes)),
+        (graph.node_data(i) for i in range(graph.num_nodes)),
+        graph.edge_u, graph.edge_v,
+        (edge_record(row) for row in range(graph.num_edges)),
+        graph.adj_ptr, graph.adj_nodes, graph.adj_edges,
+    )
+
+
+def _batched(rows, size: int = INSERT_BATCH):
+    batch = []
+    for r in rows:
+        batch.append(r)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def write_graph_store(graph, path: str | Path, multi_values: Dict = None) -> Path:
+    """Write *graph* (``nx.Graph`` or :class:`CSRGraph`) to a SQLite store; swapped in atomically.
+
+    *multi_values* as in ``write_graph_snapshot``. From a snapshot the arrays are
+    streamed, so building needs little more memory than the node type list.
+    """
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.unlink(missing_ok=True)
+    nodes, node_data, edge_u, edge_v, edge_data, adj_ptr, adj_nodes, adj_edges = _graph_rows(graph, multi_values)
+
+    con = sqlite3.connect(tmp)
+    con.execute("PRAGMA journal_mode=OFF")
+    con.execute("PRAGMA synchronous=OFF")
+    con.executescript(SCHEMA)
+
+    types: List[str | None] = []
+
+    def node_rows():
+        for i, (nid, d) in enumerate(zip(nodes, node_data)):
+            types.append(d.get("type"))
+            yield i, str(nid), d.get("type"), d.get("label"), json.dumps(d, ensure_ascii=False)
+
+    def edge_rows():
+        for row, (u, v, d) in enumerate(zip(edge_u, edge_v, edge_data)):
+            d = {k: x for k, x in d.items() if k not in GEXF_EDGE_KEYS}
+            yield row, int(u), int(v), json.dumps(d, ensure_ascii=False)
+
+    def adj_rows():
+        for i in range(len(types)):
+            start, end = int(adj_ptr[i]), int(adj_ptr[i + 1])
+            for seq, (j, row) in enumerate(zip(adj_nodes[start:end], adj_edges[start:end])):
+                yield i, types[int(j)], seq, int(j), int(row)
+
+    for sql, rows in (
+        ("INSERT INTO nodes VALUES (?, ?, ?, ?, ?)", node_rows()),
+        ("INSERT INTO edges VALUES (?, ?, ?, ?)", edge_rows()),
+        ("INSERT INTO adj VALUES (?, ?, ?, ?, ?)", adj_rows()),
+    ):
+        for batch in _batched(rows):
+            con.executemany(sql, batch)
+    con.executescript(INDEXES)
+
+    num_edges = con.execute("SELECT COUNT(*) FROM edges").fetchone()[0]
+    con.executemany("INSERT INTO meta VALUES (?, ?)", [
+        ("version", str(STORE_VERSION)),
+        ("num_nodes", str(len(types))),
+        ("num_edges", str(num_edges)),
+    ])
+    con.commit()
+    con.execute("ANALYZE")
+    con.close()
+    os.replace(tmp, path)
+    return path
+
+
+# ---------------------------------------------------------------------------
+# Reader
+# ---------------------------------------------------------------------------
+
+class _LRU:
+    """Thread-safe LRU bounded by the total *weight* of its values, with hit / miss counters."""
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[tuple, Tuple[object, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._data.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: tuple, value, weight: int = 1) -> None:
+        weight = max(1, weight)
+        if weight > self.maxsize:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+            self._data[key] = (value, weight)
+            self.size += weight
+            while self.size > self.maxsize:
+                _key, (_value, w) = self._data.popitem(last=False)
+                self.size -= w
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._data),
+                    "size": self.size, "maxsize": self.maxsize}
+
+
+class _StoreNodeView:
+    """``G.nodes`` look-alike over the ``nodes`` table."""
+
+    __slots__ = ("_g",)
+
+    def __init__(self, store: "GraphStore") -> None:
+        self._g = store
+
+    def __len__(self) -> int:
+        return self._g.num_nodes
+
+    def __iter__(self) -> Iterator[str]:
+        return (nid for (nid,) in self._g._scan("SELECT id FROM nodes ORDER BY idx"))
+
+    def __contains__(self, nid) -> bool:
+        return self._g._node(nid) is not None
+
+    def __getitem__(self, nid) -> Dict:
+        node = self._g._node(nid)
+        if node is None:
+            raise KeyError(nid)
+        return dict(node[1])
+
+    def __call__(self, data: bool = False):
+        if not data:
+            return iter(self)
+        return ((nid, json.loads(d)) for nid, d in self._g._scan("SELECT id, data FROM nodes ORDER BY idx"))
+
+
+def _joined(d: Dict) -> Dict:
+    """Edge attributes in GEXF form: multi-valued attributes as one ``" / "``-joined string."""
+    return {k: " / ".join(v) if isinstance(v, list) else v for k, v in d.items()}
+
+
+class GraphStore:
+    """Read-only graph served from a :func:`write_graph_store` SQLite file."""
+
+    def __init__(self, path: str | Path, cache_size: int = GRAPH_STORE_CACHE_SIZE) -> None:
+        self.path = Path(path)
+        if not self.path.exists():
+            raise FileNotFoundError(f"No graph store at {self.path}")
+        self._local = threading.local()     # one read-only connection per thread
+        meta = dict(self._query("SELECT key, value FROM meta"))
+        if int(meta.get("version", 0)) != STORE_VERSION:
+            raise ValueError(f"Unsupported graph store version in {self.path}: {meta.get('version')}")
+        self.num_nodes = int(meta["num_nodes"])
+        self.num_edges = int(meta["num_edges"])
+        self.cache = _LRU(cache_size)
+        self._label_maps: Dict[str, Dict[str, str]] = {}
+        self.nodes = _StoreNodeView(self)
+
+    @staticmethod
+    def exists(path: str | Path) -> bool:
+        return Path(path).is_file()
+
+    def _connection(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = self._local.con = sqlite3.connect(f"{self.path.resolve().as_uri()}?mode=ro", uri=True)
+        return con
+
+    def _query(self, sql: str, params: tuple = ()) -> List[tuple]:
+        return self._connection().execute(sql, params).fetchall()
+
+    def _scan(self, sql: str, params: tuple = ()) -> Iterator[tuple]:
+        """Stream the rows of a table scan from the cursor instead of fetching them all."""
+        yield from self._connection().execute(sql, params)
+
+    # -- cached lookups -------------------------------------------------
+    def _node(self, nid) -> Tuple[int, Dict] | None:
+        """``(idx, attribute dict)`` of node *nid*, or None."""
+        key = ("node", str(nid))
+        node = self.cache.get(key)
+        if node is None:
+            rows = self._query("SELECT idx, data FROM nodes WHERE id = ?", (str(nid),))
+            if not rows:
+                return None
+            node = (rows[0][0], json.loads(rows[0][1]))
+            self.cache.put(key, node)
+        return node
+
+    def _typed_neighbors(self, nid, typ: str | None) -> List[Tuple[str, str]]:
+        """``[(neighbour id, label), ...]`` of *nid* (only type *typ* unless None), in neighbour order."""
+        key = ("adj", str(nid), typ)
+        nbrs = self.cache.get(key)
+        if nbrs is None:
+            node = self._node(nid)
+            if node is None:
+                return []
+            if typ is None:
+                rows = self._query("SELECT n.id, n.label FROM adj a JOIN nodes n ON n.idx = a.nbr "
+                                   "WHERE a.node = ? ORDER BY a.seq", (node[0],))
+            else:
+                rows = self._query("SELECT n.id, n.label FROM adj a JOIN nodes n ON n.idx = a.nbr "
+                                   "WHERE a.node = ? AND a.nbr_type = ? ORDER BY a.seq", (node[0], typ))
+            nbrs = [(nb, lbl or "") for nb, lbl in rows]
+            self.cache.put(key, nbrs, weight=len(nbrs))
+        return nbrs
+
+    def cache_stats(self) -> Dict[str, int]:
+        return self.cache.stats()
+
+    # -- retrieval API ----------------------------------------------------
+    def neighbors_by_type(self, nid, typ: str) -> List[str]:
+        return [nb for nb, _lbl in self._typed_neighbors(nid, typ)]
+
+    def subtopics_of(self, topic_nid: str) -> List[Tuple[str, str]]:
+        """``[(sub_nid, sub_label), ...]`` of *topic_nid*, as ``GraphHierarchy.subtopics_of``."""
+        return list(self._typed_neighbors(topic_nid, "subtopic"))
+
+    def entities_under(self, sub_nids) -> Set[str]:
+        """Entity node ids below the given subtopics (unknown ids are skipped)."""
+        return {nb for s in sub_nids if s for nb in self.neighbors_by_type(s, "entity")}
+
+    def label_map(self, typ: str) -> Dict[str, str]:
+        """``{label: node id}`` of the *typ* nodes (later nodes win, as ``node_label_map``)."""
+        m = self._label_maps.get(typ)
+        if m is None:
+            rows = self._query("SELECT label, id FROM nodes WHERE type = ? AND label IS NOT NULL ORDER BY idx", (typ,))
+            m = self._label_maps[typ] = dict(rows)
+        return m
+
+    def labels_of_type(self, typ: str) -> List[str]:
+        """Unique non-empty labels of the *typ* nodes, in node order."""
+        rows = self._query("SELECT label FROM nodes WHERE type = ? ORDER BY idx", (typ,))
+        return list(dict.fromkeys(lbl for (lbl,) in rows if lbl))
+
+    def id_by_label(self, typ: str, label: str) -> str | None:
+        return self.label_map(typ).get(label)
+
+    def _edge_row(self, u, v) -> Dict | None:
+        nu, nv = self._node(u), self._node(v)
+        if nu is None or nv is None:
+            return None
+        rows = self._query("SELECT e.data FROM adj a JOIN edges e ON e.row = a.edge "
+                           "WHERE a.node = ? AND a.nbr = ? LIMIT 1", (nu[0], nv[0]))
+        return json.loads(rows[0][0]) if rows else None
+
+    def edge_attrs_between(self, u, v) -> Dict | None:
+        """Attribute dict of edge *u*–*v* (multi-valued attributes as lists), or None."""
+        return self._edge_row(u, v)
+
+    # -- networkx-compatible API ------------------------------------------
+    def number_of_nodes(self) -> int:
+        return self.num_nodes
+
+    def number_of_edges(self) -> int:
+        return self.num_edges
+
+    def __len__(self) -> int:
+        return self.num_nodes
+
+    def __contains__(self, nid) -> bool:
+        return self._node(nid) is not None
+
+    def has_node(self, nid) -> bool:
+        return self._node(nid) is not None
+
+    def neighbors(self, nid) -> Iterator[str]:
+        if self._node(nid) is None:
+            raise nx.NetworkXError(f"The node {nid} is not in the graph.")
+        return (nb for nb, _lbl in self._typed_neighbors(nid, None))
+
+    def has_edge(self, u, v) -> bool:
+        return self._edge_row(u, v) is not None
+
+    def get_edge_data(self, u, v, default=None):
+        d = self._edge_row(u, v)
+        return default if d is None else _joined(d)
+
+    def edges(self, data: bool = False):
+        rows = self._scan("SELECT nu.id, nv.id, e.data FROM edges e "
+                          "JOIN nodes nu ON nu.idx = e.u JOIN nodes nv ON nv.idx = e.v ORDER BY e.row")
+        for u, v, d in rows:
+            yield (u, v, _joined(json.loads(d))) if data else (u, v)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from index.graph_snapshot import load_graph
+
+    parser = argparse.ArgumentParser(description="Build the SQLite graph store next to a GEXF file")
+    parser.add_argument("--dataset", help="Dataset name (uses its graph GEXF)")
+    parser.add_argument("--gexf", help="Path to a GEXF file (overrides --dataset)")
+    args = parser.parse_args()
+    if not (args.dataset or args.gexf):
+        parser.error("--dataset or --gexf is required")
+
+    gexf_path = args.gexf or str(get_config(args.dataset).get_graph_gexf_file())
+    start = time.perf_counter()
+    # the snapshot, when present, is streamed from its memory-mapped arrays
+    path = write_graph_store(load_graph(gexf_path), store_path_for(gexf_path))
+    store = GraphStore(path)
+    print(f"📁 Graph store saved: {path} ({store.number_of_nodes()} nodes, {store.number_of_edges()} edges, "
+          f"{path.stat().st_size / 2**20:.1f} MB) in {time.perf_counter() - start:.2f}s")
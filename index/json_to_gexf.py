@@ -3,7 +3,22 @@ import networkx as nx
 import os
 import html
 import re
+import sys
 import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from index.graph_snapshot import snapshot_dir_for, write_graph_snapshot
+from config import get_config
+
+config = get_config()
+GRAPH_BUILD_WORKERS = config.graph_build_workers
+GRAPH_BUILD_SHARD_SIZE = config.graph_build_shard_size
 
 def clean_id(text: str) -> str:
     """For node ID: remove spaces, special characters and convert to lowercase"""
@@ -20,34 +35,78 @@ def is_valid(item: dict) -> bool:
         and "subject" in item and "object" in item
     )
 
+try:
+    import ijson  # optional: stream triples instead of json.load-ing the whole file
+except ImportError:
+    ijson = None
+
 # ─────────────────────────────────────────────────────────────────────
-# ✅ Main execution: JSON → GEXF conversion
+# ✅ Triple streaming
 # ─────────────────────────────────────────────────────────────────────
 
-def convert_json_to_gexf(input_file: str, output_file: str = None):
+def iter_triples(input_file: str):
+    """Yield every valid triple entry of a graph JSON file, in file order.
+
+    Supports both layouts: ``{"triples": [...]}`` (A) and ``[{"triples": [...]}, ...]`` (B).
+    With ``ijson`` installed the file is parsed incrementally; otherwise it is loaded once.
+    """
+    if ijson is not None:
+        with open(input_file, 'rb') as f:
+            head = f.read(4096).lstrip(b"\xef\xbb\xbf \t\r\n")[:1]
+            f.seek(0)
+            prefix = {b"{": "triples.item", b"[": "item.triples.item"}.get(head)
+            if prefix is None:
+                return
+            for item in ijson.items(f, prefix, use_float=True):
+                if is_valid(item):
+                    yield item
+        return
+
     with open(input_file, 'r', encoding='utf-8') as f:
         data = json.load(f)
 
-    entries = []
-
     # Case A: 단일 dict 구조
     if isinstance(data, dict) and "triples" in data:
-        entries.extend([item for item in data["triples"] if is_valid(item)])
+        yield from (item for item in data["triples"] if is_valid(item))
 
     # Case B: 블록 리스트 구조
     elif isinstance(data, list):
         for block in data:
             if isinstance(block, dict) and "triples" in block:
-                entries.extend([item for item in block["triples"] if is_valid(item)])
+                yield from (item for item in block["triples"] if is_valid(item))
 
-    print(f"✅ usable triples: {len(entries)}")
-    if not entries:
-        raise ValueError("No valid triples found—check JSON structure.")
+# ─────────────────────────────────────────────────────────────────────
+# ✅ Graph assembly
+# ─────────────────────────────────────────────────────────────────────
 
-    # 그래프 생성
-    G = nx.Graph()
+class GraphAccumulator:
+    """Collects nodes and edges of the triple graph in one linear pass.
 
-    for entry in entries:
+    Duplicate predicate edges keep their labels and sentences in insertion-ordered
+    sets (dict keys) and are joined with " / " only once, in :meth:`to_graph`.
+    Nodes and edges are replayed into ``nx.Graph`` in first-insertion order, so
+    node/neighbour order matches adding them to the graph directly.
+    """
+
+    def __init__(self):
+        self.nodes = {}   # node id → (label, type); re-adding overwrites but keeps position
+        self.edges = {}   # (u, v) as first added → attribute dict
+        self.alias = {}   # (v, u) → (u, v) key of the same undirected edge
+
+    def _key(self, u, v):
+        if (u, v) in self.edges:
+            return (u, v)
+        return self.alias.get((u, v))
+
+    def _hier_edge(self, u, v, **attrs):
+        key = self._key(u, v)
+        if key is None:
+            key = (u, v)
+            self.edges[key] = {}
+            self.alias[(v, u)] = key
+        self.edges[key].update(attrs)
+
+    def add(self, entry: dict):
         subj, pred, obj = entry['triple']
         subj, pred, obj = subj.lower(), pred.lower(), obj.lower()
         subj_st = entry['subject']['subtopic'].lower()
@@ -75,35 +134,127 @@ def convert_json_to_gexf(input_file: str, output_file: str = None):
             (subj_node, subj, 'entity'), (subj_st_node, subj_st, 'subtopic'), (subj_mt_node, subj_mt, 'topic'),
             (obj_node, obj, 'entity'), (obj_st_node, obj_st, 'subtopic'), (obj_mt_node, obj_mt, 'topic')
         ]:
-            safe_label = label
-            G.add_node(node, label=safe_label.lower(), type=typ)
+            self.nodes[node] = (label.lower(), typ)
 
         # 계층 엣지
-        G.add_edge(subj_node, subj_st_node, label='has_subtopic', relation_type='subtopic_relation', topic=subj_mt)
-        G.add_edge(subj_st_node, subj_mt_node, label='has_topic', relation_type='topic_relation')
-        G.add_edge(obj_node, obj_st_node, label='has_subtopic', relation_type='subtopic_relation', topic=obj_mt)
-        G.add_edge(obj_st_node, obj_mt_node, label='has_topic', relation_type='topic_relation')
-
-        # 문장 및 predicate 엣지
-        safe_sentence = sentence
-        safe_pred     = pred.lower()
-        
-        if G.has_edge(subj_node, obj_node):
-            existing = G[subj_node][obj_node]
-            if safe_pred and safe_pred not in existing['label']:
-                existing['label'] += f" / {safe_pred}"
-            if safe_sentence and safe_sentence not in existing['sentence']:
-                existing['sentence'] += f" / {safe_sentence}"
+        self._hier_edge(subj_node, subj_st_node, label='has_subtopic', relation_type='subtopic_relation', topic=subj_mt)
+        self._hier_edge(subj_st_node, subj_mt_node, label='has_topic', relation_type='topic_relation')
+        self._hier_edge(obj_node, obj_st_node, label='has_subtopic', relation_type='subtopic_relation', topic=obj_mt)
+        self._hier_edge(obj_st_node, obj_mt_node, label='has_topic', relation_type='topic_relation')
+
+        # 문장 및 predicate 엣지: label/sentence 는 set 으로 모았다가 마지막에 한 번만 join
+        key = self._key(subj_node, obj_node)
+        if key is not None:
+            existing = self.edges[key]
+            if pred:
+                existing['label'].setdefault(pred)
+            if sentence:
+                existing['sentence'].setdefault(sentence)
             existing['weight'] = existing.get('weight', 1) + 1
         else:
-            G.add_edge(
-                subj_node,
-                obj_node,
-                label=safe_pred,
-                relation_type='predicate_relation',
-                sentence=safe_sentence,
-                weight=1
-            )
+            self.edges[(subj_node, obj_node)] = {
+                'label': {pred: None},
+                'relation_type': 'predicate_relation',
+                'sentence': {sentence: None},
+                'weight': 1,
+            }
+            self.alias[(obj_node, subj_node)] = (subj_node, obj_node)
+
+    def merge(self, other: "GraphAccumulator"):
+        """Fold in the accumulator of the *next* contiguous run of triples.
+
+        Gives the same tables as feeding both runs through one accumulator: positions
+        come from the first shard that saw a node/edge, node attributes from the last,
+        duplicate edges union their label/sentence sets and add weights.
+        """
+        self.nodes.update(other.nodes)
+        for (u, v), attrs in other.edges.items():
+            key = self._key(u, v)
+            if key is None:
+                self.edges[(u, v)] = attrs
+                self.alias[(v, u)] = (u, v)
+            elif attrs.get('relation_type') == 'predicate_relation':
+                existing = self.edges[key]
+                for field in ('label', 'sentence'):
+                    for value in attrs[field]:
+                        if value:   # empty strings only survive as the very first value
+                            existing[field].setdefault(value)
+                existing['weight'] = existing.get('weight', 1) + attrs['weight']
+            else:
+                self.edges[key].update(attrs)
+
+    def to_graph(self) -> nx.Graph:
+        G = nx.Graph()
+        for node, (label, typ) in self.nodes.items():
+            G.add_node(node, label=label, type=typ)
+        for (u, v), attrs in self.edges.items():
+            if attrs.get('relation_type') == 'predicate_relation':
+                attrs = dict(attrs, label=" / ".join(attrs['label']), sentence=" / ".join(attrs['sentence']))
+            G.add_edge(u, v, **attrs)
+        return G
+
+    def multi_values(self) -> dict:
+        """``{(u, v): {'label': [...], 'sentence': [...]}}`` of every predicate edge, for the snapshot."""
+        return {
+            key: {'label': list(attrs['label']), 'sentence': list(attrs['sentence'])}
+            for key, attrs in self.edges.items()
+            if attrs.get('relation_type') == 'predicate_relation'
+        }
+
+def _build_shard(entries: list) -> GraphAccumulator:
+    acc = GraphAccumulator()
+    for entry in entries:
+        acc.add(entry)
+    return acc
+
+
+def assemble_graph(triples, workers: int = GRAPH_BUILD_WORKERS, shard_size: int = GRAPH_BUILD_SHARD_SIZE):
+    """Build the triple graph; returns ``(GraphAccumulator, n_triples)``.
+
+    With ``workers > 1`` contiguous shards of ``shard_size`` triples are assembled in
+    a process pool (id cleaning, lower-casing, per-shard merging) and folded in shard
+    order, so the result is identical to the serial pass. At most ``2 * workers``
+    shards are in flight, which keeps memory bounded while the input is streamed.
+    """
+    triples = iter(triples)
+    if workers <= 1:
+        acc = GraphAccumulator()
+        n_entries = 0
+        for entry in triples:
+            acc.add(entry)
+            n_entries += 1
+        return acc, n_entries
+
+    acc = GraphAccumulator()
+    n_entries = 0
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            while len(pending) < 2 * workers:
+                shard = list(islice(triples, shard_size))
+                if not shard:
+                    break
+                n_entries += len(shard)
+                pending.append(pool.submit(_build_shard, shard))
+            if not pending:
+                break
+            acc.merge(pending.popleft().result())
+    return acc, n_entries
+
+# ─────────────────────────────────────────────────────────────────────
+# ✅ Main execution: JSON → GEXF conversion
+# ─────────────────────────────────────────────────────────────────────
+
+def convert_json_to_gexf(input_file: str, output_file: str = None,
+                         workers: int = GRAPH_BUILD_WORKERS, shard_size: int = GRAPH_BUILD_SHARD_SIZE):
+    acc, n_entries = assemble_graph(iter_triples(input_file), workers, shard_size)
+
+    print(f"✅ usable triples: {n_entries}")
+    if not n_entries:
+        raise ValueError("No valid triples found—check JSON structure.")
+
+    # 그래프 생성 (한 번만)
+    G = acc.to_graph()
 
     # 디버그: 엣지 속성 검사
     print("=== Edge Attributes Check ===")
@@ -119,10 +270,21 @@ def convert_json_to_gexf(input_file: str, output_file: str = None):
     nx.write_gexf(G, output_file)
     print("📁 File saved:", output_file)
 
+    # 검색 쪽에서 XML 파싱 없이 mmap 으로 여는 바이너리 스냅샷 (GEXF 는 export 용으로 유지)
+    # predicate / sentence 는 " / " 로 이어 붙인 문자열이 아니라 리스트로 저장
+    snapshot_dir = write_graph_snapshot(G, snapshot_dir_for(output_file), multi_values=acc.multi_values())
+    print("📁 Snapshot saved:", snapshot_dir)
+
 
 # ─────────────────────────────────────────────────────────────────────
 # ✅ CLI에서 직접 실행할 경우만 작동
 # ─────────────────────────────────────────────────────────────────────
 
 if __name__ == "__main__":
-    convert_json_to_gexf("UltraDomain/Mix/graph_v1.json")
+    parser = argparse.ArgumentParser(description="Convert extracted triples (JSON) to GEXF + graph snapshot")
+    parser.add_argument("--input", default="UltraDomain/Mix/graph_v1.json", help="Graph JSON file")
+    parser.add_argument("--output", help="GEXF output path (default: input with .gexf)")
+    parser.add_argument("--workers", type=int, default=GRAPH_BUILD_WORKERS, help="Assembly processes (0/1 = serial)")
+    parser.add_argument("--shard-size", type=int, default=GRAPH_BUILD_SHARD_SIZE, help="Triples per shard")
+    args = parser.parse_args()
+    convert_json_to_gexf(args.input, args.output, args.workers, args.shard_size)
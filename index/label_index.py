@@ -0,0 +1,192 @@
+"""
+Precomputed embeddings of the graph's topic and subtopic labels, for shortlisting.
+
+``choose_topics_from_graph`` used to put every topic label into
+``TOPIC_CHOICE_PROMPT``; on large graphs that is thousands of labels per query.
+With ``TOPIC_SHORTLIST_SIZE=N`` the retriever first ranks the labels by cosine
+similarity to the query vector (embedded once and handed on to the edge
+search, so no extra API call) and only the top N go into the prompt. ``SUBTOPIC_SHORTLIST_SIZE`` does the same for the children of each
+chosen topic in ``SUBTOPIC_CHOICE_PROMPT``: the subtopic rows of a topic are
+stored contiguously, so ranking them is one dot product over a matrix slice
+and the prompt size no longer grows with the topic's fan-out.
+Layout, written next to the GEXF::
+
+    <name>_graph.labels/
+        meta.json              embedding model, counts, format version
+        topic_labels.{bin,idx}.npy   unique topic labels, graph order
+        topic_vecs.npy         float32 L2-normalised rows, one per label
+        sub_topics.{bin,idx}.npy     topic node ids, one per subtopic block
+        sub_ptr.npy            block offsets: rows of topic i are sub_ptr[i]:sub_ptr[i+1]
+        sub_nids / sub_labels.{bin,idx}.npy   subtopic (node id, label) per row, neighbour order
+        sub_vecs.npy           float32 L2-normalised rows (a label shared by topics repeats)
+
+``index/edge_embedding.py`` refreshes it after a build / update when a shortlist
+size is set (or with ``--labels``); labels go through the sentence embedding
+cache, so unchanged labels are not re-sent.
+
+    python index/label_index.py --dataset hotpotQA     # (re)build for an existing index
+"""
+
+from __future__ import annotations
+
+import json
+import shutil
+import sys
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from config import get_config
+from index.graph_hierarchy import hierarchy_for
+from index.payload_store import StringTable, replace_dir, write_string_table
+from index.topic_choice import extract_graph_topic_labels
+
+LABEL_INDEX_VERSION = 1
+
+
+def label_index_dir_for(gexf_path: str | Path) -> Path:
+    """Label index directory of a GEXF file (``foo_graph.gexf`` → ``foo_graph.labels/``)."""
+    return Path(gexf_path).with_suffix(".labels")
+
+
+def _embed(embedder, labels: List[str], desc: str) -> np.ndarray:
+    if not labels:
+        return np.zeros((0, 0), dtype="float32")
+    return np.ascontiguousarray(embedder.embed_texts(labels, desc=desc), dtype="float32")
+
+
+def build_label_index(graph, embedder, out_dir: str | Path) -> Path:
+    """Embed the topic and subtopic labels of *graph* with *embedder* (an ``EdgeEmbedderFAISS``) into *out_dir*."""
+    out_dir = Path(out_dir)
+    labels = extract_graph_topic_labels(graph)
+    vecs = _embed(embedder, labels, "Embedding topic labels")
+
+    # one contiguous block of subtopic rows per topic node
+    h = hierarchy_for(graph)
+    topic_nids = [n for n, d in graph.nodes(data=True) if d.get("type") == "topic"]
+    sub_ptr = np.zeros(len(topic_nids) + 1, dtype=np.int64)
+    sub_nids, sub_labels = [], []
+    for i, t in enumerate(topic_nids):
+        for nid, lbl in h.subtopics_of(t):
+            sub_nids.append(str(nid))
+            sub_labels.append(lbl)
+        sub_ptr[i + 1] = len(sub_nids)
+    unique = list(dict.fromkeys(sub_labels))    # each distinct label is embedded once
+    unique_vecs = _embed(embedder, unique, "Embedding subtopic labels")
+    row_of = {lbl: i for i, lbl in enumerate(unique)}
+    sub_vecs = unique_vecs[[row_of[lbl] for lbl in sub_labels]] if sub_labels else unique_vecs
+
+    tmp_dir = out_dir.with_name(out_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    write_string_table(tmp_dir, "topic_labels", labels)
+    np.save(tmp_dir / "topic_vecs.npy", vecs)
+    write_string_table(tmp_dir, "sub_topics", [str(t) for t in topic_nids])
+    write_string_table(tmp_dir, "sub_nids", sub_nids)
+    write_string_table(tmp_dir, "sub_labels", sub_labels)
+    np.save(tmp_dir / "sub_ptr.npy", sub_ptr)
+    np.save(tmp_dir / "sub_vecs.npy", np.ascontiguousarray(sub_vecs, dtype="float32"))
+    with open(tmp_dir / "meta.json", "w", encoding="utf-8") as f:
+        json.dump({
+            "version": LABEL_INDEX_VERSION,
+            "model": embedder.model_id,
+            "num_topics": len(labels),
+            "num_subtopic_rows": len(sub_nids),
+            "num_subtopic_labels": len(unique),
+        }, f, ensure_ascii=False)
+
+    replace_dir(tmp_dir, out_dir)
+    return out_dir
+
+
+class LabelIndex:
+    """Read side of :func:`build_label_index`."""
+
+    def __init__(self, directory: str | Path, model_id: str | None = None) -> None:
+        self.dir = Path(directory)
+        with open(self.dir / "meta.json", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != LABEL_INDEX_VERSION:
+            raise ValueError(f"Unsupported label index version in {self.dir}: {self.meta.get('version')}")
+        if model_id is not None and self.meta["model"] != model_id:
+            raise ValueError(
+                f"Label index {self.dir} was built with '{self.meta['model']}', but queries are embedded "
+                f"with '{model_id}'. Rebuild it with index/label_index.py."
+            )
+        table = StringTable(self.dir, "topic_labels")
+        self.topic_labels: List[str] = [table[i] for i in range(len(table))]
+        self.topic_vecs = np.load(self.dir / "topic_vecs.npy", mmap_mode="r")
+
+        topics = StringTable(self.dir, "sub_topics")
+        self._block = {topics[i]: i for i in range(len(topics))}
+        self.sub_ptr = np.load(self.dir / "sub_ptr.npy", mmap_mode="r")
+        self.sub_nids = StringTable(self.dir, "sub_nids")
+        self.sub_labels = StringTable(self.dir, "sub_labels")
+        self.sub_vecs = np.load(self.dir / "sub_vecs.npy", mmap_mode="r")
+
+    @staticmethod
+    def exists(directory: str | Path) -> bool:
+        return (Path(directory) / "meta.json").exists()
+
+    def shortlist_topics(self, q_vec: np.ndarray, n: int) -> List[str]:
+        """The *n* topic labels most similar to *q_vec*, in graph order (all labels if n ≥ their number)."""
+        if n >= len(self.topic_labels):
+            return list(self.topic_labels)
+        scores = np.asarray(self.topic_vecs) @ np.asarray(q_vec, dtype="float32")
+        top = np.argpartition(-scores, n - 1)[:n]
+        return [self.topic_labels[int(i)] for i in np.sort(top)]
+
+    def subtopic_count(self, topic_nid: str) -> int:
+        i = self._block.get(str(topic_nid))
+        return 0 if i is None else int(self.sub_ptr[i + 1] - self.sub_ptr[i])
+
+    def shortlist_subtopics(self, topic_nid: str, q_vec: np.ndarray, n: int) -> List[Tuple[str, str]] | None:
+        """``[(sub_nid, label), ...]`` of the *n* children of *topic_nid* most similar to *q_vec*.
+
+        Children keep their neighbour order (as ``extract_subtopics_for_topic``);
+        all of them when the topic has at most *n*. None if the topic is unknown
+        to this index (built before the graph changed).
+        """
+        i = self._block.get(str(topic_nid))
+        if i is None:
+            return None
+        start, end = int(self.sub_ptr[i]), int(self.sub_ptr[i + 1])
+        if end - start > n:
+            scores = np.asarray(self.sub_vecs[start:end]) @ np.asarray(q_vec, dtype="float32")
+            rows = start + np.sort(np.argpartition(-scores, n - 1)[:n])
+        else:
+            rows = range(start, end)
+        return [(self.sub_nids[int(r)], self.sub_labels[int(r)]) for r in rows]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from index.edge_embedding import EMBED_BACKEND, EMBEDDING_MODEL, OPENAI_API_KEY, EdgeEmbedderFAISS
+    from index.graph_snapshot import load_graph
+
+    parser = argparse.ArgumentParser(description="Embed the graph's topic / subtopic labels for query-time shortlisting")
+    parser.add_argument("--dataset", required=True, help="Dataset name")
+    parser.add_argument("--backend", default=EMBED_BACKEND, choices=["openai", "local", "stub"],
+                        help="Embedding backend (must match the one queries use)")
+    parser.add_argument("--stub", action="store_true", help="Shorthand for --backend stub (offline fake vectors)")
+    args = parser.parse_args()
+
+    config = get_config(args.dataset)
+    gexf_path = config.get_graph_gexf_file()
+    embedder = EdgeEmbedderFAISS(
+        gexf_path=str(gexf_path),
+        json_path=str(config.get_graph_json_file()),
+        embedding_model=EMBEDDING_MODEL,
+        openai_api_key=OPENAI_API_KEY,
+        index_path=str(config.get_edge_index_file()),
+        payload_path=str(config.get_edge_payload_file()),
+        backend="stub" if args.stub else args.backend,
+    )
+    out = build_label_index(load_graph(gexf_path), embedder, label_index_dir_for(gexf_path))
+    meta = LabelIndex(out).meta
+    print(f"📁 Label index saved: {out} ({meta['num_topics']} topics, {meta['num_subtopic_labels']} subtopic labels)")
@@ -0,0 +1,275 @@
+"""
+Columnar, memory-mappable store for edge-index payloads.
+
+Replaces the pickled ``np.save(..., dtype=object)`` payload list. A store is a
+directory of plain ``.npy`` arrays that are opened with ``mmap_mode="r"``, so
+opening it costs a few file maps regardless of graph size; Python dicts are only
+created for rows that :meth:`EdgePayloadStore.row` actually returns::
+
+    <payload_dir>/
+        meta.json                 counts, chunk-id kind, format version
+        sentences.{bin,idx}.npy   per-row sentence text (UTF-8 blob + offsets)
+        nodes.{bin,idx}.npy       interned, sorted node ids (edge sources/targets)
+        labels.{bin,idx}.npy      interned, sorted edge labels
+        chunks.{bin,idx}.npy      interned chunk ids (only when they are strings)
+        row_chunk.npy             int64 chunk id (or chunk table index) per row, -1 = none
+        row_edge_ptr.npy          CSR offsets of each row's edges (empty range = tombstone)
+        edge_source.npy           int32 node-table ids
+        edge_target.npy           int32 node-table ids
+        edge_label.npy            int32 label-table ids
+        edge_seq.npy              int32 position of the sentence within its GEXF edge
+        entity_ptr.npy            CSR offsets of each node's rows
+        entity_rows.npy           int64 rows touching each node (sorted, unique)
+"""
+
+from __future__ import annotations
+
+import bisect
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List
+
+import numpy as np
+
+STORE_VERSION = 1
+
+
+def payload_dir_for(payload_path: str) -> Path:
+    """Columnar store directory for a payload path (``foo.npy`` → ``foo/``)."""
+    path = Path(payload_path)
+    return path.with_suffix("") if path.suffix == ".npy" else path
+
+
+def make_edge_id(src: str, dst: str, label: str, seq: int) -> str:
+    """Edge id format used since the first index version."""
+    return f"{src}-{dst}-{label}".replace(" ", "_") + f"#{seq}"
+
+
+# ---------------------------------------------------------------------------
+# String tables
+# ---------------------------------------------------------------------------
+
+def write_string_table(out_dir: Path, name: str, strings: List[str]) -> None:
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    np.save(out_dir / f"{name}.bin.npy", np.frombuffer(b"".join(encoded), dtype=np.uint8))
+    np.save(out_dir / f"{name}.idx.npy", offsets)
+
+
+class StringTable:
+    """Read-only, memory-mapped table of UTF-8 strings addressed by integer id.
+
+    When the table was written in sorted order, :meth:`find` does a binary search
+    that decodes only O(log n) entries.
+    """
+
+    def __init__(self, directory: Path, name: str) -> None:
+        self._blob = np.load(directory / f"{name}.bin.npy", mmap_mode="r")
+        self._offsets = np.load(directory / f"{name}.idx.npy", mmap_mode="r")
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        start, end = self._offsets[i], self._offsets[i + 1]
+        return self._blob[start:end].tobytes().decode("utf-8")
+
+    def find(self, s: str) -> int:
+        """Id of *s* in a sorted table, or -1."""
+        i = bisect.bisect_left(self, s)
+        return i if i < len(self) and self[i] == s else -1
+
+
+# ---------------------------------------------------------------------------
+# Writer
+# ---------------------------------------------------------------------------
+
+def replace_dir(tmp_dir: Path, out_dir: Path) -> None:
+    """Swap a fully written *tmp_dir* in for *out_dir* (tmp → ``.old`` → rename).
+
+    Readers never see a half-written directory; the previous version is only
+    deleted once the new one is in place.
+    """
+    old_dir = out_dir.with_name(out_dir.name + ".old")
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if out_dir.exists():
+        os.replace(out_dir, old_dir)
+    os.replace(tmp_dir, out_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def write_payload_store(out_dir: str | Path, payloads: Iterable[Dict]) -> Path:
+    """Write dict payloads (``{"sentence", "chunk_id", "edges": [...]}``) as a columnar store.
+
+    The store is written to a temporary sibling directory and swapped in, so a
+    reader never sees a half-written store.
+    """
+    out_dir = Path(out_dir)
+    payloads = list(payloads)
+
+    node_set, label_set, chunk_set = set(), set(), set()
+    chunks_are_int = True
+    for p in payloads:
+        cid = p.get("chunk_id")
+        if cid is not None:
+            chunk_set.add(cid)
+            chunks_are_int = chunks_are_int and isinstance(cid, (int, np.integer))
+        for e in p["edges"]:
+            node_set.add(e["source"])
+            node_set.add(e["target"])
+            label_set.add(e.get("label") or "")
+
+    nodes, labels = sorted(node_set), sorted(label_set)
+    node_id = {s: i for i, s in enumerate(nodes)}
+    label_id = {s: i for i, s in enumerate(labels)}
+    chunks = [] if chunks_are_int else sorted(str(c) for c in chunk_set)
+    chunk_id = {s: i for i, s in enumerate(chunks)}
+
+    n_rows = len(payloads)
+    n_edges = sum(len(p["edges"]) for p in payloads)
+    row_chunk = np.full(n_rows, -1, dtype=np.int64)
+    row_edge_ptr = np.zeros(n_rows + 1, dtype=np.int64)
+    edge_source = np.empty(n_edges, dtype=np.int32)
+    edge_target = np.empty(n_edges, dtype=np.int32)
+    edge_label = np.empty(n_edges, dtype=np.int32)
+    edge_seq = np.empty(n_edges, dtype=np.int32)
+
+    j = 0
+    for row, p in enumerate(payloads):
+        cid = p.get("chunk_id")
+        if cid is not None:
+            row_chunk[row] = int(cid) if chunks_are_int else chunk_id[str(cid)]
+        for e in p["edges"]:
+            edge_source[j] = node_id[e["source"]]
+            edge_target[j] = node_id[e["target"]]
+            edge_label[j] = label_id[e.get("label") or ""]
+            eid = e.get("edge_id") or ""
+            edge_seq[j] = int(eid.rsplit("#", 1)[1]) if "#" in eid else 0
+            j += 1
+        row_edge_ptr[row + 1] = j
+
+    # entity → rows inverted index (unique (node, row) pairs grouped by node)
+    edge_rows = np.repeat(np.arange(n_rows, dtype=np.int64), np.diff(row_edge_ptr))
+    pairs = np.unique(np.concatenate([
+        edge_source.astype(np.int64) * max(n_rows, 1) + edge_rows,
+        edge_target.astype(np.int64) * max(n_rows, 1) + edge_rows,
+    ]))
+    pair_nodes = pairs // max(n_rows, 1)
+    entity_rows = pairs % max(n_rows, 1)
+    entity_ptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(pair_nodes, minlength=len(nodes)), out=entity_ptr[1:])
+
+    tmp_dir = out_dir.with_name(out_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    write_string_table(tmp_dir, "sentences", [p["sentence"] for p in payloads])
+    write_string_table(tmp_dir, "nodes", nodes)
+    write_string_table(tmp_dir, "labels", labels)
+    write_string_table(tmp_dir, "chunks", chunks)
+    for name, arr in [
+        ("row_chunk", row_chunk), ("row_edge_ptr", row_edge_ptr),
+        ("edge_source", edge_source), ("edge_target", edge_target),
+        ("edge_label", edge_label), ("edge_seq", edge_seq),
+        ("entity_ptr", entity_ptr), ("entity_rows", entity_rows),
+    ]:
+        np.save(tmp_dir / f"{name}.npy", arr)
+    with open(tmp_dir / "meta.json", "w", encoding="utf-8") as f:
+        json.dump({
+            "version": STORE_VERSION,
+            "num_rows": n_rows,
+            "num_edges": n_edges,
+            "num_nodes": len(nodes),
+            "chunk_ids": "int" if chunks_are_int else "str",
+        }, f)
+
+    replace_dir(tmp_dir, out_dir)
+    return out_dir
+
+
+# ---------------------------------------------------------------------------
+# Reader
+# ---------------------------------------------------------------------------
+
+class EdgePayloadStore:
+    """Memory-mapped payload store; rows are materialised as dicts on access."""
+
+    def __init__(self, directory: str | Path) -> None:
+        self.dir = Path(directory)
+        with open(self.dir / "meta.json", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != STORE_VERSION:
+            raise ValueError(f"Unsupported payload store version in {self.dir}: {self.meta.get('version')}")
+
+        self.sentences = StringTable(self.dir, "sentences")
+        self.nodes = StringTable(self.dir, "nodes")
+        self.labels = StringTable(self.dir, "labels")
+        self.chunks = StringTable(self.dir, "chunks")
+        load = lambda name: np.load(self.dir / f"{name}.npy", mmap_mode="r")
+        self.row_chunk = load("row_chunk")
+        self.row_edge_ptr = load("row_edge_ptr")
+        self.edge_source = load("edge_source")
+        self.edge_target = load("edge_target")
+        self.edge_label = load("edge_label")
+        self.edge_seq = load("edge_seq")
+        self.entity_ptr = load("entity_ptr")
+        self.entity_rows = load("entity_rows")
+
+    @staticmethod
+    def exists(directory: str | Path) -> bool:
+        return (Path(directory) / "meta.json").exists()
+
+    def __len__(self) -> int:
+        return len(self.row_edge_ptr) - 1
+
+    def __getitem__(self, row: int) -> Dict:
+        return self.row(int(row))
+
+    def __iter__(self) -> Iterator[Dict]:
+        for row in range(len(self)):
+            yield self.row(row)
+
+    def to_list(self) -> List[Dict]:
+        return list(self)
+
+    def chunk_id(self, row: int):
+        cid = int(self.row_chunk[row])
+        if cid < 0:
+            return None
+        return cid if self.meta["chunk_ids"] == "int" else self.chunks[cid]
+
+    def row(self, row: int) -> Dict:
+        start, end = int(self.row_edge_ptr[row]), int(self.row_edge_ptr[row + 1])
+        edges = []
+        for j in range(start, end):
+            src = self.nodes[int(self.edge_source[j])]
+            dst = self.nodes[int(self.edge_target[j])]
+            lbl = self.labels[int(self.edge_label[j])]
+            edges.append({
+                "edge_id": make_edge_id(src, dst, lbl, int(self.edge_seq[j])),
+                "source": src,
+                "target": dst,
+                "label": lbl,
+            })
+        return {"sentence": self.sentences[row], "chunk_id": self.chunk_id(row), "edges": edges}
+
+    def is_tombstone(self, row: int) -> bool:
+        return self.row_edge_ptr[row] == self.row_edge_ptr[row + 1]
+
+    def node_rows(self, node: str) -> np.ndarray:
+        """Rows with at least one edge touching *node* (empty if unknown)."""
+        nid = self.nodes.find(node)
+        if nid < 0:
+            return np.zeros(0, dtype=np.int64)
+        return self.entity_rows[self.entity_ptr[nid]:self.entity_ptr[nid + 1]]
+
+    def candidate_rows(self, entities: Iterable[str]) -> np.ndarray:
+        """Sorted unique rows touching any of *entities*."""
+        parts = [self.node_rows(e) for e in entities]
+        parts = [p for p in parts if len(p)]
+        if not parts:
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate(parts))
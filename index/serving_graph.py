@@ -0,0 +1,223 @@
+"""
+Compact in-memory graph for the query path.
+
+A networkx graph read from GEXF stores every node and edge as a dict of dicts
+with string keys; for our graphs that costs several times the size of the data.
+:class:`ServingGraph` keeps the same information as
+
+* integer node ids (position in ``node_ids``) and a ``{node id: int}`` index,
+* CSR adjacency (``adj_ptr`` / ``adj_nodes`` / ``adj_edges``) in the narrowest
+  integer dtype that fits,
+* attribute columns shared with the graph snapshot (:class:`~index.graph_snapshot.Column`,
+  :class:`~index.graph_snapshot.ListColumn`): labels and types are small-int
+  codes into tables holding each distinct string once, sentences are id lists
+  into a de-duplicated sentence table.
+
+It exposes what retrieval needs - label → id, neighbours by type, edge
+attributes - plus the read-only networkx subset of :class:`~index.graph_snapshot.CSRGraph`,
+so it can be handed to ``choose_topics_from_graph``, ``GraphHierarchy`` and the
+edge embedder unchanged.
+
+    python index/serving_graph.py --dataset hotpotQA     # memory report vs. networkx
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from config import get_config
+from index.graph_snapshot import (
+    Column, CSRGraph, ListColumn, NodeView, encode_column, graph_arrays, load_graph,
+)
+from index.graph_store import GraphStore, store_path_for
+
+config = get_config()
+GRAPH_SERVING_FORMAT = config.graph_serving_format
+
+
+def _narrow(arr: np.ndarray) -> np.ndarray:
+    """Smallest signed integer dtype that holds every value of *arr* (and -1)."""
+    arr = np.asarray(arr)
+    hi = int(arr.max()) if arr.size else 0
+    for dtype in (np.int8, np.int16, np.int32):
+        if hi <= np.iinfo(dtype).max:
+            return arr.astype(dtype)
+    return arr.astype(np.int64)
+
+
+def _strings(table) -> List[str]:
+    # tables are already de-duplicated; sys.intern would only grow the interpreter-wide intern dict
+    return [table[i] for i in range(len(table))]
+
+
+def _in_memory(col):
+    """RAM copy of a (possibly memory-mapped) column with narrowed ids and plain-list string tables."""
+    if col.kind == "strlist":
+        return ListColumn(_narrow(col.values), _narrow(col.ptr), np.array(col.missing, dtype=bool),
+                          _strings(col.table))
+    if col.kind == "str":
+        return Column("str", _narrow(col.values), _strings(col.table))
+    return Column(col.kind, np.array(col.values, dtype=np.float64))
+
+
+class ServingGraph(CSRGraph):
+    """Read-only graph over integer ids and string-table codes, built from a GEXF graph or a snapshot."""
+
+    __slots__ = ("num_nodes", "num_edges", "node_ids", "_index", "adj_ptr", "adj_nodes", "adj_edges",
+                 "edge_u", "edge_v", "node_attrs", "edge_attrs", "nodes", "_by_label", "__weakref__")
+
+    def __init__(self, graph, multi_values: Dict = None) -> None:
+        """Copy *graph* (``nx.Graph`` or any :class:`CSRGraph`); *multi_values* as in ``write_graph_snapshot``."""
+        if isinstance(graph, CSRGraph):
+            self.node_ids = _strings(graph.node_ids)
+            self.num_nodes, self.num_edges = graph.num_nodes, graph.num_edges
+            arrays = (graph.adj_ptr, graph.adj_nodes, graph.adj_edges, graph.edge_u, graph.edge_v)
+            self.node_attrs = {n: _in_memory(c) for n, c in graph.node_attrs.items()}
+            self.edge_attrs = {n: _in_memory(c) for n, c in graph.edge_attrs.items()}
+        else:
+            nodes, node_data, edge_u, edge_v, edge_data, adj_ptr, adj_nodes, adj_edges = graph_arrays(graph, multi_values)
+            self.node_ids = [str(n) for n in nodes]
+            self.num_nodes, self.num_edges = len(nodes), len(edge_u)
+            arrays = (adj_ptr, adj_nodes, adj_edges, edge_u, edge_v)
+            self.node_attrs = self._columns(node_data)
+            self.edge_attrs = self._columns(edge_data)
+        self.adj_ptr, self.adj_nodes, self.adj_edges, self.edge_u, self.edge_v = (_narrow(a) for a in arrays)
+        self._index = {nid: i for i, nid in enumerate(self.node_ids)}
+        self._by_label: Dict[str, Dict[str, int]] = {}
+        self.nodes = NodeView(self)
+
+    @staticmethod
+    def _columns(records: List[Dict]) -> Dict:
+        cols = {}
+        for name in dict.fromkeys(k for d in records for k in d):
+            kind, arrays, table = encode_column([d.get(name) for d in records])
+            if kind == "strlist":
+                cols[name] = _in_memory(ListColumn(arrays["attr"], arrays["ptr"], arrays["none"], table))
+            else:
+                cols[name] = _in_memory(Column(kind, arrays["attr"], table))
+        return cols
+
+    @classmethod
+    def from_gexf(cls, gexf_path: str | Path) -> "ServingGraph":
+        """Build from the graph of *gexf_path* (its snapshot when present, else the GEXF itself)."""
+        return cls(load_graph(gexf_path))
+
+    # -- retrieval API -----------------------------------------------------
+    def node_index(self, nid) -> int:
+        return self._index.get(nid, -1)
+
+    def id_by_label(self, typ: str, label: str) -> str | None:
+        """Node id of the *typ* node labelled *label* (the last one, as ``node_label_map``)."""
+        by_label = self._by_label.get(typ)
+        if by_label is None:
+            labels = self.node_attrs["label"]
+            by_label = self._by_label[typ] = {labels[int(i)]: int(i) for i in self.node_ids_of_type(typ)}
+        i = by_label.get(label)
+        return None if i is None else self.node_ids[i]
+
+    def neighbor_ids_by_type(self, i: int, typ: str) -> np.ndarray:
+        """Integer ids of the neighbours of node *i* whose type is *typ*, in neighbour order."""
+        code = self.type_code(typ)
+        nbrs = self.neighbor_ids(i)
+        if code < 0:
+            return nbrs[:0]
+        return nbrs[self.node_attrs["type"].values[nbrs] == code]
+
+    def neighbors_by_type(self, nid, typ: str) -> List[str]:
+        i = self.node_index(nid)
+        if i < 0:
+            return []
+        return [self.node_ids[int(j)] for j in self.neighbor_ids_by_type(i, typ)]
+
+    def edge_attrs_between(self, u, v) -> Dict | None:
+        """Attribute dict of edge *u*–*v* (multi-valued attributes as lists), or None."""
+        iu, iv = self.node_index(u), self.node_index(v)
+        if iu < 0 or iv < 0:
+            return None
+        hit = np.flatnonzero(self.neighbor_ids(iu) == iv)
+        if len(hit) == 0:
+            return None
+        row = int(self.adj_edges[self.adj_ptr[iu] + hit[0]])
+        return {name: (col.items(row) if col.kind == "strlist" else col[row])
+                for name, col in self.edge_attrs.items()
+                if not (col.missing[row] if col.kind == "strlist" else col[row] is None)}
+
+    # -- memory -------------------------------------------------------------
+    def memory_bytes(self) -> int:
+        """Approximate heap size: arrays + id index + string tables (shared strings counted once)."""
+        seen = set()
+
+        def strings(table) -> int:
+            total = sys.getsizeof(table)
+            for s in table:
+                if id(s) not in seen:
+                    seen.add(id(s))
+                    total += sys.getsizeof(s)
+            return total
+
+        total = strings(self.node_ids) + sys.getsizeof(self._index)
+        total += sum(a.nbytes for a in (self.adj_ptr, self.adj_nodes, self.adj_edges, self.edge_u, self.edge_v))
+        for col in list(self.node_attrs.values()) + list(self.edge_attrs.values()):
+            total += col.values.nbytes
+            if col.kind == "strlist":
+                total += col.ptr.nbytes + col.missing.nbytes
+            if col.table is not None:
+                total += strings(col.table)
+        return total
+
+
+def open_serving_graph(gexf_path: str | Path, fmt: str = GRAPH_SERVING_FORMAT):
+    """Graph for the query path: ``snapshot`` (mmap snapshot, else GEXF), ``interned`` (ServingGraph)
+    or ``sqlite`` (disk-backed GraphStore built by ``index/graph_store.py``)."""
+    if fmt == "interned":
+        return ServingGraph.from_gexf(gexf_path)
+    if fmt == "sqlite":
+        return GraphStore(store_path_for(gexf_path))
+    if fmt != "snapshot":
+        raise ValueError(f"Unknown GRAPH_SERVING_FORMAT: {fmt!r} (expected 'snapshot', 'interned' or 'sqlite')")
+    return load_graph(gexf_path)
+
+
+if __name__ == "__main__":
+    import argparse
+    import gc
+    import time
+    import tracemalloc
+
+    import networkx as nx
+
+    parser = argparse.ArgumentParser(description="Memory of a networkx graph vs. ServingGraph")
+    parser.add_argument("--dataset", help="Dataset name (uses its graph GEXF)")
+    parser.add_argument("--gexf", help="Path to a GEXF file (overrides --dataset)")
+    args = parser.parse_args()
+    if not (args.dataset or args.gexf):
+        parser.error("--dataset or --gexf is required")
+    gexf_path = args.gexf or str(get_config(args.dataset).get_graph_gexf_file())
+
+    def measured(build):
+        gc.collect()
+        tracemalloc.start()
+        start = time.perf_counter()
+        obj = build()
+        seconds = time.perf_counter() - start
+        gc.collect()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return obj, size, seconds
+
+    G, nx_bytes, nx_s = measured(lambda: nx.read_gexf(gexf_path))
+    del G
+    # built from its own GEXF read so that its strings are not shared with G
+    S, serving_bytes, serving_s = measured(lambda: ServingGraph(nx.read_gexf(gexf_path)))
+    print(f"📊 {gexf_path}: {S.num_nodes} nodes, {S.num_edges} edges")
+    print(f"   networkx      {nx_bytes / 2**20:9.1f} MB   (read_gexf {nx_s:.2f}s)")
+    print(f"   ServingGraph  {serving_bytes / 2**20:9.1f} MB   (read + build {serving_s:.2f}s, "
+          f"self-reported {S.memory_bytes() / 2**20:.1f} MB)")
+    print(f"   reduction     {nx_bytes / max(serving_bytes, 1):9.1f}x")
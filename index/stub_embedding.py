@@ -0,0 +1,66 @@
+"""
+Offline stand-in for the OpenAI embeddings endpoint.
+
+``StubEmbeddingClient`` exposes the same ``client.embeddings.create(input=..., model=...)``
+call shape as :class:`openai.OpenAI`, so it can be passed to ``EdgeEmbedderFAISS``
+(``client=``) to build and benchmark indexes without network access.
+
+Vectors are deterministic per text (seeded from a hash of the text), so repeated
+runs produce identical indexes. Optional latency parameters simulate the cost of
+an HTTP round trip and of per-item provider work.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from types import SimpleNamespace
+from typing import List
+
+import numpy as np
+
+
+def stub_vector(text: str, dim: int) -> np.ndarray:
+    """Deterministic pseudo-random float32 vector for *text*."""
+    seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+    return np.random.default_rng(seed).standard_normal(dim).astype("float32")
+
+
+class _StubEmbeddings:
+    def __init__(self, owner: "StubEmbeddingClient") -> None:
+        self._owner = owner
+
+    def create(self, input, model: str, **_kwargs):
+        texts: List[str] = [input] if isinstance(input, str) else list(input)
+        owner = self._owner
+        with owner._lock:
+            owner.calls += 1
+            owner.items += len(texts)
+        delay = owner.request_latency + owner.item_latency * len(texts)
+        if delay > 0:
+            time.sleep(delay)
+        data = [
+            SimpleNamespace(index=i, embedding=stub_vector(t, owner.dim).tolist(), object="embedding")
+            for i, t in enumerate(texts)
+        ]
+        return SimpleNamespace(data=data, model=model, object="list")
+
+
+class StubEmbeddingClient:
+    """Drop-in replacement for ``OpenAI`` that only implements ``embeddings.create``.
+
+    Args:
+        dim: Embedding dimension (text-embedding-3-small uses 1536).
+        request_latency: Seconds slept per request (simulated round trip).
+        item_latency: Seconds slept per input text (simulated provider throughput).
+    """
+
+    def __init__(self, dim: int = 1536, request_latency: float = 0.0, item_latency: float = 0.0) -> None:
+        self.dim = dim
+        self.request_latency = request_latency
+        self.item_latency = item_latency
+        self.calls = 0
+        self.items = 0
+        self._lock = threading.Lock()
+        self.embeddings = _StubEmbeddings(self)
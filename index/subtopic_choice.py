@@ -24,6 +24,7 @@ PROJECT_ROOT = Path(__file__).parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
 
 from prompt.subtopic_choice import SUBTOPIC_CHOICE_PROMPT
+from index.graph_hierarchy import hierarchy_for
 
 from dotenv import load_dotenv
 
@@ -47,12 +48,29 @@ RETRY_BACKOFF = config.retry_backoff
 # ---------------------------------------------------------------------------
 
 def extract_subtopics_for_topic(graph: nx.Graph, topic_nid: str) -> List[Tuple[str, str]]:
-    """Return ``[(sub_nid, sub_label), ...]`` directly connected to *topic_nid*."""
-    return [
-        (nbr, graph.nodes[nbr].get("label", ""))
-        for nbr in graph.neighbors(topic_nid)
-        if graph.nodes[nbr].get("type") == "subtopic"
-    ]
+    """Return ``[(sub_nid, sub_label), ...]`` directly connected to *topic_nid*.
+
+    Read from the graph's precomputed topic → subtopic posting list
+    (:func:`index.graph_hierarchy.hierarchy_for`), built once per graph.
+    """
+    return hierarchy_for(graph).subtopics_of(topic_nid)
+
+def build_subtopic_prompt(
+    question: str,
+    topic_label: str,
+    sub_labels: List[str],
+    max_subtopics: int = SUBTOPIC_CHOICE_MAX,
+    min_subtopics: int = SUBTOPIC_CHOICE_MIN,
+) -> str:
+    """``SUBTOPIC_CHOICE_PROMPT`` filled in with *question*, the topic and its candidate *sub_labels*."""
+    return (
+        SUBTOPIC_CHOICE_PROMPT
+        .replace("{{TOPIC_LABEL}}", topic_label)
+        .replace("{{SUBTOPIC_LIST}}", json.dumps(sub_labels, ensure_ascii=False))
+        .replace("{question}", question)
+        .replace("{max_subtopics}", str(max_subtopics))
+        .replace("{min_subtopics}", str(min(min_subtopics, len(sub_labels))))
+    )
 
 # ---------------------------------------------------------------------------
 # Core LLM selector – with retries
@@ -66,29 +84,26 @@ def choose_subtopics_for_topic(
     model: str = DEFAULT_MODEL,
     max_subtopics: int = SUBTOPIC_CHOICE_MAX,
     min_subtopics: int = SUBTOPIC_CHOICE_MIN,
+    candidates: List[Tuple[str, str]] | None = None,
 ) -> dict[str, List[str]]:
     """Return up to ``max_subtopics`` relevant subtopic **labels** for *topic_nid*.
 
     LLM의 응답 중 유효한 서브토픽만 필터링해서 반환함. 응답이 JSON 파싱 실패 시에만 재시도.
+    *candidates* (``[(sub_nid, label), ...]``, e.g. ``LabelIndex.shortlist_subtopics``)
+    replaces the topic's full child list in the prompt.
     """
 
     if graph.nodes[topic_nid].get("type") != "topic":
         raise ValueError(f"Node {topic_nid} is not of type 'topic'.")
 
-    # 1) 후보 서브토픽 모으기
-    sub_nodes = extract_subtopics_for_topic(graph, topic_nid)
+    # 1) 후보 서브토픽 모으기 (shortlist가 있으면 그것만)
+    sub_nodes = candidates if candidates is not None else extract_subtopics_for_topic(graph, topic_nid)
     if not sub_nodes:
         return []
     sub_labels = [lbl for _nid, lbl in sub_nodes]
-    min_subtopics = min(min_subtopics, len(sub_labels))
     # 2) 프롬프트 구성
-    prompt = (
-        SUBTOPIC_CHOICE_PROMPT
-        .replace("{{TOPIC_LABEL}}", graph.nodes[topic_nid].get("label", ""))
-        .replace("{{SUBTOPIC_LIST}}", json.dumps(sub_labels, ensure_ascii=False))
-        .replace("{question}", question)
-        .replace("{max_subtopics}", str(max_subtopics))
-        .replace("{min_subtopics}", str(min_subtopics))
+    prompt = build_subtopic_prompt(
+        question, graph.nodes[topic_nid].get("label", ""), sub_labels, max_subtopics, min_subtopics,
     )
 
     # 3) 최대 MAX_RETRIES까지 JSON 파싱 실패 시 재시도
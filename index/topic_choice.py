@@ -19,6 +19,7 @@ sys.path.insert(0, str(PROJECT_ROOT))
 
 # Local prompt template
 from prompt.topic_choice import TOPIC_CHOICE_PROMPT
+from index.graph_store import GraphStore
 
 from dotenv import load_dotenv
 
@@ -39,6 +40,8 @@ MAX_RETRIES = config.max_retries
 
 def extract_graph_topic_labels(graph: nx.Graph) -> List[str]:
     """Return **unique** topic labels from the graph, preserving insertion order."""
+    if isinstance(graph, GraphStore):    # read from the (type, label) index, no node scan
+        return graph.labels_of_type("topic")
     labels_seen = set()
     labels = []
     for _nid, data in graph.nodes(data=True):
@@ -49,6 +52,22 @@ def extract_graph_topic_labels(graph: nx.Graph) -> List[str]:
                 labels_seen.add(lbl)
     return labels
 
+def build_topic_prompt(
+    question: str,
+    topic_labels: List[str],
+    max_topics: int = TOPIC_CHOICE_MAX,
+    min_topics: int = TOPIC_CHOICE_MIN,
+) -> str:
+    """``TOPIC_CHOICE_PROMPT`` filled in with *question* and the candidate *topic_labels*."""
+    return (
+        TOPIC_CHOICE_PROMPT
+        .replace("{{TOPIC_LIST}}", json.dumps(topic_labels, ensure_ascii=False))
+        .replace("{{question}}", question)
+        .replace("{max_topics}", str(max_topics))
+        .replace("{min_topics}", str(TOPIC_CHOICE_MIN))
+        .replace("{min_topics}", str(min_topics))
+    )
+
 def choose_topics_from_graph(
     question: str,
     graph: nx.Graph,
@@ -57,11 +76,14 @@ def choose_topics_from_graph(
     max_topics: int = TOPIC_CHOICE_MAX,
     min_topics: int = TOPIC_CHOICE_MIN,
     max_retries: int = MAX_RETRIES,
+    candidates: List[str] | None = None,
 ) -> List[str]:
     """Ask the LLM to pick up to *max_topics* relevant topics from *graph*.
 
     If the LLM response is invalid, it will retry up to `max_retries` times
-    by re-asking the same prompt.
+    by re-asking the same prompt. *candidates* (e.g. an embedding shortlist
+    from ``LabelIndex.shortlist_topics``) replaces the full topic label list
+    in the prompt.
 
     Returns
     -------
@@ -74,18 +96,11 @@ def choose_topics_from_graph(
         If no valid result is obtained after max_retries.
     """
 
-    topic_labels = extract_graph_topic_labels(graph)
+    topic_labels = candidates or extract_graph_topic_labels(graph)
     if not topic_labels:
         raise ValueError("Graph contains no topic nodes (type='topic').")
 
-    prompt_str = (
-        TOPIC_CHOICE_PROMPT
-        .replace("{{TOPIC_LIST}}", json.dumps(topic_labels, ensure_ascii=False))
-        .replace("{{question}}", question)
-        .replace("{max_topics}", str(max_topics))
-        .replace("{min_topics}", str(TOPIC_CHOICE_MIN))
-        .replace("{min_topics}", str(min_topics))
-    )
+    prompt_str = build_topic_prompt(question, topic_labels, max_topics, min_topics)
     # print(prompt_str)
 
     for attempt in range(1, max_retries + 1):